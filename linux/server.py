@@ -7,11 +7,31 @@ Provides Python code execution in isolated virtual environment with full system
 
 import sys
 import os
-import subprocess
+import re
+import ast
+import asyncio
 import traceback
-import json
+import collections
+import functools
+import shlex
+import signal
+import struct
+import shutil
+import tempfile
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+
+try:
+    # 可选依赖：orjson 解析 pip list 的 JSON 输出更快
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+try:
+    # 可选依赖：uvloop 的事件循环在子进程管道和 stdio 读写上开销更低
+    import uvloop
+except ImportError:
+    uvloop = None
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
@@ -22,13 +42,19 @@ from mcp.types import Tool, TextContent
 # VIRTUAL ENVIRONMENT ENFORCEMENT
 # ============================================================
 
+@functools.lru_cache(maxsize=None)
+def is_in_venv() -> bool:
+    """检查是否在虚拟环境中运行。"""
+    return hasattr(sys, 'real_prefix') or (
+        hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix
+    )
+
+
+@functools.lru_cache(maxsize=None)
 def get_venv_python() -> str:
     """获取虚拟环境的 Python 解释器路径。"""
     # 检查是否已在虚拟环境中
-    in_venv = hasattr(sys, 'real_prefix') or (
-        hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix
-    )
-    if in_venv:
+    if is_in_venv():
         return sys.executable
     
     # 在脚本目录中查找虚拟环境
@@ -48,13 +74,6 @@ def get_venv_python() -> str:
     return sys.executable
 
 
-def is_in_venv() -> bool:
-    """检查是否在虚拟环境中运行。"""
-    return hasattr(sys, 'real_prefix') or (
-        hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix
-    )
-
-
 # Initialize venv paths
 VENV_PYTHON = get_venv_python()
 VENV_INFO = {'in_venv': is_in_venv(), 'python_path': VENV_PYTHON}
@@ -77,6 +96,388 @@ print(f"   Virtual Environment: {'YES' if VENV_INFO['in_venv'] else 'NO'}", file
 print(f"   Python: {VENV_PYTHON}", file=sys.stderr)
 print(f"   Fonts Directory: {FONTS_DIR}", file=sys.stderr)
 
+# Matplotlib font configuration for Chinese characters, run once per worker
+# 使用绝对路径确保字体正确加载
+FONTS_DIR_ABS = str(FONTS_DIR.resolve())
+MPL_CONFIG_DIR = Path(__file__).parent / ".matplotlib"
+MPL_CONFIG_DIR_ABS = str(MPL_CONFIG_DIR.resolve())
+FONT_SETUP_SCRIPT = MPL_CONFIG_DIR / "mcp_font_setup.py"
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+
+# 字体家族名提取用到的正则只编译一次
+_WEIGHT_SUFFIX_RE = re.compile(
+    r'-(Bold|Regular|Light|Medium|Thin|ExtraLight|SemiBold|Black|Heavy|Italic|BoldItalic|LightItalic|SemiBoldItalic|ExtraLightItalic)+$',
+    re.IGNORECASE
+)
+# 驼峰分词位置：小写后接大写，或连续大写中最后一个大写字母之前（如 XMLParser）
+_CAMEL_BOUNDARY_RE = re.compile(r'(?<=[a-z])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])')
+
+
+def extract_font_family(filename: str) -> str:
+    """从文件名提取字体家族名称"""
+    # 移除扩展名
+    name = Path(filename).stem
+    # 移除字重后缀
+    name = _WEIGHT_SUFFIX_RE.sub('', name)
+    # 在驼峰命名处添加空格
+    name = _CAMEL_BOUNDARY_RE.sub(' ', name)
+    return name.strip()
+
+
+def scan_fonts_dir() -> list[tuple[str, str]]:
+    """扫描 fonts/ 目录，返回 (字体绝对路径, 字体家族) 列表。"""
+    # 一次 scandir 匹配所有扩展名（不区分大小写），不再为每个扩展名 glob 一遍
+    with os.scandir(FONTS_DIR) as it:
+        font_files = [
+            (os.path.realpath(entry.path), extract_font_family(entry.name))
+            for entry in it
+            if entry.name.lower().endswith(FONT_EXTENSIONS)
+        ]
+    return sorted(font_files)
+
+
+def write_font_setup() -> str:
+    """生成字体配置脚本，返回脚本路径。
+
+    fonts/ 目录只在服务器启动时扫描一次，字体路径和家族名直接写入脚本，
+    worker 启动时无需再遍历目录或解析文件名。新增字体后需重启服务器。
+    """
+    font_files = scan_fonts_dir()
+    source = f"""
+# Auto-injected: Chinese font configuration
+import os
+from pathlib import Path
+
+# 使用绝对路径（从 server.py 传入）
+fonts_dir = Path(r"{FONTS_DIR_ABS}")
+os.environ["MPLCONFIGDIR"] = r"{MPL_CONFIG_DIR_ABS}"
+
+# server.py 启动时扫描 fonts/ 得到的 (字体绝对路径, 字体家族) 列表
+font_files = {font_files!r}
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.font_manager as fm
+
+    # 加载 fonts/ 目录中的所有字体文件，只保留加载成功的字体家族
+    font_families = {{}}
+    for font_path_abs, family in font_files:
+        try:
+            # 使用绝对路径添加字体到 matplotlib
+            fm.fontManager.addfont(font_path_abs)
+            font_families[family] = None
+        except Exception:
+            pass
+    
+    # 使用提取的字体家族配置 matplotlib
+    if font_families:
+        plt.rcParams['font.sans-serif'] = list(font_families) + ['DejaVu Sans']
+        plt.rcParams['axes.unicode_minus'] = False
+except ImportError:
+    pass
+except Exception:
+    # 确保字体配置失败不会影响代码执行
+    pass
+"""
+    MPL_CONFIG_DIR.mkdir(exist_ok=True)
+    FONT_SETUP_SCRIPT.write_text(source, encoding="utf-8")
+    # 传 .py 而不是预编译的 .pyc：worker 由 VENV_PYTHON 运行，
+    # 其版本可能与服务器不同，.pyc 的 magic number 会不匹配
+    return str(FONT_SETUP_SCRIPT)
+
+
+FONT_SETUP = write_font_setup()
+
+
+# ============================================================
+# SUBPROCESS OUTPUT CAPTURE
+# ============================================================
+
+# 子进程统一以 UTF-8 输出，与 server 端的解码方式一致，不受系统区域设置影响
+CHILD_ENV = {**os.environ, 'PYTHONIOENCODING': 'utf-8'}
+
+# 单个输出流在内存中保留的最大字节数，超出部分只计数不保存
+MAX_INLINE_OUTPUT = 16 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# 子进程输出管道的缓冲区大小（Linux 默认仅 64 KiB，输出较多时子进程会频繁阻塞等待读取）
+PIPE_SIZE = 1024 * 1024
+# uvloop 的 subprocess_exec 不支持 pipesize 参数，此时使用系统默认的管道大小
+PIPE_OPTIONS = {} if uvloop else {"pipesize": PIPE_SIZE}
+
+
+class OutputBuffer:
+    """Keeps the head and tail of a stream, about MAX_INLINE_OUTPUT bytes in total."""
+
+    def __init__(self):
+        self.half = MAX_INLINE_OUTPUT // 2
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        room = self.half - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self.tail += chunk
+            # 攒够一倍再裁剪，使裁剪的拷贝开销按字节均摊
+            if len(self.tail) > 2 * self.half:
+                del self.tail[:-self.half]
+
+    def getvalue(self) -> bytes:
+        tail = self.tail[-self.half:]
+        dropped = self.size - len(self.head) - len(tail)
+        if not dropped:
+            return bytes(self.head + tail)
+        marker = f"\n... [truncated {dropped} bytes] ...\n".encode()
+        return b"".join((self.head, marker, tail))
+
+
+async def _drain(stream: asyncio.StreamReader, buf: OutputBuffer) -> None:
+    """Read a pipe until EOF into buf."""
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buf.write(chunk)
+
+
+async def _communicate(
+    process: asyncio.subprocess.Process, stdout: OutputBuffer, stderr: OutputBuffer
+) -> None:
+    """Like process.communicate(), but with bounded memory per stream.
+
+    Output goes into the caller's buffers, so it is still available if the
+    call is cancelled (e.g. on timeout).
+    """
+    await asyncio.gather(_drain(process.stdout, stdout), _drain(process.stderr, stderr))
+    await process.wait()
+
+
+# 超时后等待子进程响应 SIGTERM 的时间，之后改用 SIGKILL
+KILL_GRACE_PERIOD = 2.0
+
+
+def _signal_group(process: asyncio.subprocess.Process, sig: int) -> None:
+    """向子进程所在的进程组发送信号（子进程以 start_new_session 启动，自成一组）。"""
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+async def terminate_process(process: asyncio.subprocess.Process) -> None:
+    """先 SIGTERM 再 SIGKILL 结束子进程及其派生的所有进程，避免遗留孤儿进程。"""
+    if process.returncode is not None:
+        return
+    _signal_group(process, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), timeout=KILL_GRACE_PERIOD)
+    except asyncio.TimeoutError:
+        pass
+    # 清理没有响应 SIGTERM 的进程，以及主进程退出后仍残留在组内的子进程
+    _signal_group(process, signal.SIGKILL)
+    await process.wait()
+
+
+# ============================================================
+# PERSISTENT WORKER POOL
+# ============================================================
+
+# worker.py 在常驻解释器中执行代码，省去每次调用的解释器启动和 matplotlib 导入
+WORKER_SCRIPT = Path(__file__).parent / "worker.py"
+WORKER_POOL_SIZE = 2
+# 每个 worker 执行多少次请求后回收，限制用户代码残留的全局状态
+WORKER_MAX_REQUESTS = 50
+# worker 把每次请求的代码写入该目录下的源文件（见 worker.py），server 退出时删除
+WORKER_SOURCE_DIR = tempfile.mkdtemp(prefix="mcp_worker_")
+
+# 协议格式见 worker.py
+REQUEST_HEADER = struct.Struct("!BII")
+RESPONSE_HEADER = struct.Struct("!iBIIII")
+MODE_EXEC = 0
+MODE_EVAL = 1
+# (exit_code, stdout, stderr, value, type)；value/type 仅 MODE_EVAL 求值成功时非空
+WorkerResponse = tuple[int, bytes, bytes, bytes, bytes]
+
+
+class Worker:
+    """A long-lived interpreter running worker.py."""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.requests = 0
+        # worker 报告用户代码留下了仍在运行的线程，不能再复用
+        self.retire = False
+
+    @classmethod
+    async def spawn(cls, preamble: Optional[str]) -> "Worker":
+        """Start a worker and wait until it has run the preamble script."""
+        cmd = [VENV_PYTHON, str(WORKER_SCRIPT), str(MAX_INLINE_OUTPUT), WORKER_SOURCE_DIR]
+        if preamble:
+            cmd.append(preamble)
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            start_new_session=True,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            **PIPE_OPTIONS,
+            env=CHILD_ENV
+        )
+        worker = cls(process)
+        try:
+            # worker 执行完初始化脚本后发送一帧就绪响应
+            exit_code, _, stderr, _, _ = await worker._read_response()
+        except BaseException:
+            worker.kill()
+            raise
+        if exit_code != 0:
+            print(
+                f"警告: 初始化脚本执行失败 (exit code {exit_code}): {preamble}\n"
+                + stderr.decode("utf-8", errors="replace"),
+                file=sys.stderr
+            )
+        return worker
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def run(self, cwd: str, code: str, mode: int) -> WorkerResponse:
+        """Send one request and return the worker's response."""
+        cwd_bytes = cwd.encode("utf-8")
+        code_bytes = code.encode("utf-8")
+        self.process.stdin.write(
+            REQUEST_HEADER.pack(mode, len(cwd_bytes), len(code_bytes)) + cwd_bytes + code_bytes
+        )
+        await self.process.stdin.drain()
+        response = await self._read_response()
+        self.requests += 1
+        return response
+
+    async def _read_response(self) -> WorkerResponse:
+        header = await self.process.stdout.readexactly(RESPONSE_HEADER.size)
+        exit_code, retire, *lengths = RESPONSE_HEADER.unpack(header)
+        self.retire = bool(retire)
+        # 各字段紧邻，一次读出后再按长度切分
+        payload = await self.process.stdout.readexactly(sum(lengths))
+        fields = []
+        start = 0
+        for length in lengths:
+            fields.append(payload[start:start + length])
+            start += length
+        return (exit_code, *fields)
+
+    def close(self) -> None:
+        """Ask the worker to exit by closing its request pipe."""
+        if self.alive:
+            self.process.stdin.close()
+
+    def kill(self) -> None:
+        """Kill the worker together with any processes the user code started."""
+        if self.alive:
+            _signal_group(self.process, signal.SIGKILL)
+
+
+class WorkerPool:
+    """Keeps up to `size` warm workers; extra concurrent calls get a fresh one."""
+
+    def __init__(self, preamble: Optional[str], size: int, max_requests: int):
+        self.preamble = preamble
+        self.size = size
+        self.max_requests = max_requests
+        self._idle: list[Worker] = []
+        self._pending: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Warm up the pool in the background."""
+        self._refill()
+
+    async def acquire(self) -> Worker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive:
+                return worker
+        return await Worker.spawn(self.preamble)
+
+    def release(self, worker: Worker) -> None:
+        """Return a healthy worker to the pool, or retire it."""
+        if worker.retire:
+            # 遗留的线程会阻止 worker 正常退出，且其输出会混入后续请求
+            self.discard(worker)
+            return
+        if (
+            worker.alive
+            and worker.requests < self.max_requests
+            and len(self._idle) < self.size
+        ):
+            self._idle.append(worker)
+        else:
+            worker.close()
+        self._refill()
+
+    def discard(self, worker: Worker) -> None:
+        """Kill a worker whose state is unknown (timeout, broken pipe)."""
+        worker.kill()
+        self._refill()
+
+    async def run(self, cwd: str, code: str, timeout: float, mode: int = MODE_EXEC) -> WorkerResponse:
+        """Run code in a pooled worker; a timed-out worker is killed, not reused."""
+        worker = await self.acquire()
+        try:
+            result = await asyncio.wait_for(worker.run(cwd, code, mode), timeout=timeout)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # 用户代码终止了 worker 进程（如 os._exit 或崩溃），该次输出无法取回
+            self.discard(worker)
+            exit_code = await worker.process.wait()
+            stderr = f"Python worker exited unexpectedly with code {exit_code}; output was lost\n".encode()
+            return exit_code, b"", stderr, b"", b""
+        except BaseException:
+            self.discard(worker)
+            raise
+        self.release(worker)
+        return result
+
+    def close(self) -> None:
+        for task in self._pending:
+            task.cancel()
+        for worker in self._idle:
+            worker.close()
+        self._idle.clear()
+
+    async def shutdown(self) -> None:
+        """Close all workers and wait for them to exit before the loop closes."""
+        workers = list(self._idle)
+        self.close()
+        await asyncio.gather(*(worker.process.wait() for worker in workers))
+
+    def _refill(self) -> None:
+        while len(self._idle) + len(self._pending) < self.size:
+            task = asyncio.create_task(Worker.spawn(self.preamble))
+            self._pending.add(task)
+            task.add_done_callback(self._on_spawned)
+
+    def _on_spawned(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            print(f"警告: Python worker 启动失败: {task.exception()!r}", file=sys.stderr)
+            return
+        worker = task.result()
+        if len(self._idle) < self.size:
+            self._idle.append(worker)
+        else:
+            worker.close()
+
+
+WORKER_POOL = WorkerPool(FONT_SETUP, WORKER_POOL_SIZE, WORKER_MAX_REQUESTS)
+
 
 # ============================================================
 # MCP SERVER SETUP
@@ -85,119 +486,134 @@ print(f"   Fonts Directory: {FONTS_DIR}", file=sys.stderr)
 app = Server("python-executor")
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available Python execution tools."""
-    return [
-        Tool(
-            name="python_execute",
-            description="执行Python代码，支持完整系统访问、包导入、多行代码，返回stdout/stderr",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "code": {
-                        "type": "string",
-                        "description": "要执行的Python代码(在一个代码块中完成所有操作)"
-                    },
-                    "working_dir": {
-                        "type": "string",
-                        "description": "工作目录(可选，默认/tmp)"
-                    },
-                    "timeout": {
-                        "type": "number",
-                        "description": "超时秒数(默认30)"
-                    }
+# 工具定义是静态的，只在模块加载时构建一次
+TOOLS = [
+    Tool(
+        name="python_execute",
+        description="执行Python代码，支持完整系统访问、包导入、多行代码，返回stdout/stderr",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "code": {
+                    "type": "string",
+                    "description": "要执行的Python代码(在一个代码块中完成所有操作)"
                 },
-                "required": ["code"]
-            }
-        ),
-        Tool(
-            name="python_install",
-            description="使用pip安装Python包，支持单个或多个包",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "packages": {
-                        "type": "string",
-                        "description": "包名(空格分隔，如'numpy pandas')"
-                    },
-                    "upgrade": {
-                        "type": "boolean",
-                        "description": "是否升级(默认false)"
-                    }
+                "working_dir": {
+                    "type": "string",
+                    "description": "工作目录(可选，默认/tmp)"
                 },
-                "required": ["packages"]
-            }
-        ),
-        Tool(
-            name="python_run_script",
-            description="运行Python脚本文件",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "script_path": {
-                        "type": "string",
-                        "description": "脚本绝对路径"
-                    },
-                    "args": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "命令行参数"
-                    },
-                    "working_dir": {
-                        "type": "string",
-                        "description": "工作目录(可选)"
-                    },
-                    "timeout": {
-                        "type": "number",
-                        "description": "超时秒数(默认60)"
-                    }
+                "timeout": {
+                    "type": "number",
+                    "description": "超时秒数(默认30)"
+                }
+            },
+            "required": ["code"]
+        }
+    ),
+    Tool(
+        name="python_install",
+        description="使用pip安装Python包，支持单个或多个包",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "packages": {
+                    "type": "string",
+                    "description": "包名(空格分隔，如'numpy pandas'；含空格的版本约束需加引号)"
                 },
-                "required": ["script_path"]
-            }
-        ),
-        Tool(
-            name="python_eval",
-            description="快速求值Python表达式并返回结果",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "expression": {
-                        "type": "string",
-                        "description": "要求值的表达式"
-                    }
+                "upgrade": {
+                    "type": "boolean",
+                    "description": "是否升级(默认false)"
+                }
+            },
+            "required": ["packages"]
+        }
+    ),
+    Tool(
+        name="python_run_script",
+        description="运行Python脚本文件",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "script_path": {
+                    "type": "string",
+                    "description": "脚本绝对路径"
                 },
-                "required": ["expression"]
-            }
-        ),
-        Tool(
-            name="python_list_packages",
-            description="列出所有已安装的Python包",
-            inputSchema={
-                "type": "object",
-                "properties": {},
-                "required": []
-            }
-        )
-    ]
+                "args": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "命令行参数"
+                },
+                "working_dir": {
+                    "type": "string",
+                    "description": "工作目录(可选)"
+                },
+                "timeout": {
+                    "type": "number",
+                    "description": "超时秒数(默认60)"
+                }
+            },
+            "required": ["script_path"]
+        }
+    ),
+    Tool(
+        name="python_eval",
+        description="快速求值Python表达式并返回结果",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "expression": {
+                    "type": "string",
+                    "description": "要求值的表达式"
+                }
+            },
+            "required": ["expression"]
+        }
+    ),
+    Tool(
+        name="python_list_packages",
+        description="列出所有已安装的Python包",
+        inputSchema={
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    )
+]
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available Python execution tools."""
+    return TOOLS
+
+
+# MCP 框架为每个请求单独起任务，并发调用会同时执行；限制同时运行的工具调用数，
+# 避免大量并发请求一次性启动过多解释器进程
+MAX_CONCURRENT_CALLS = max(4, os.cpu_count() or 1)
+CALL_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+# python_install 已由 PIP_INSTALL_LOCK 串行执行，不占并发名额，
+# 否则排队等锁的安装（每次最长 PIP_INSTALL_TIMEOUT 秒）会挡住其他工具调用
+UNLIMITED_TOOLS = {"python_install"}
 
 
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     """Handle tool execution."""
     try:
-        if name == "python_execute":
-            return await execute_python(arguments)
-        elif name == "python_install":
-            return await install_packages(arguments)
-        elif name == "python_run_script":
-            return await run_script(arguments)
-        elif name == "python_eval":
-            return await eval_expression(arguments)
-        elif name == "python_list_packages":
-            return await list_packages()
-        else:
+        handler = TOOL_HANDLERS.get(name)
+        if handler is None:
             return [TextContent(type="text", text=f"Unknown tool: {name}")]
+        # 只在调用前检查必填参数；处理函数内部的 KeyError 属于 server 自身的错误
+        missing = [key for key in REQUIRED_ARGS[name] if key not in arguments]
+        if missing:
+            return [TextContent(type="text", text=f"Missing required argument for {name}: {missing[0]}")]
+        if name in UNLIMITED_TOOLS:
+            return await handler(arguments)
+        async with CALL_SEMAPHORE:
+            return await handler(arguments)
+    except asyncio.TimeoutError:
+        # 预期内的错误只返回简短说明，不格式化 server 自身的 traceback
+        return [TextContent(type="text", text=f"Tool {name} timed out")]
     except Exception as e:
         error_msg = f"Error executing {name}:\n{traceback.format_exc()}"
         return [TextContent(type="text", text=error_msg)]
@@ -213,128 +629,126 @@ async def execute_python(args: dict) -> list[TextContent]:
     working_dir = args.get("working_dir", "/tmp")
     timeout = args.get("timeout", 30)
 
-    # Prepend matplotlib font configuration for Chinese characters
-    # 使用绝对路径确保字体正确加载
-    fonts_dir_abs = str(FONTS_DIR.resolve())
-    mpl_config_dir_abs = str((Path(__file__).parent / ".matplotlib").resolve())
+    # Run in a warm worker; the font configuration has already been applied there
+    try:
+        exit_code, stdout, stderr, _, _ = await WORKER_POOL.run(working_dir, code, timeout)
+    except asyncio.TimeoutError:
+        return [TextContent(type="text", text=f"Execution timed out after {timeout} seconds")]
     
-    font_config = f"""
-# Auto-injected: Chinese font configuration
-import os
-import re
-from pathlib import Path
+    parts = [
+        "=== Execution Result ===\n",
+        f"Exit Code: {exit_code}\n\n",
+    ]
+    
+    if stdout:
+        # 解码结果直接放入 parts，避免再经 f-string 复制一遍（输出可能有数 MB）
+        parts.extend(("=== STDOUT ===\n", stdout.decode('utf-8', errors='replace'), "\n"))
+    
+    if stderr:
+        parts.extend(("=== STDERR ===\n", stderr.decode('utf-8', errors='replace'), "\n"))
+    
+    if exit_code == 0:
+        parts.append("\n✓ Execution completed successfully")
+    else:
+        parts.append(f"\n✗ Execution failed with exit code {exit_code}")
+    
+    return [TextContent(type="text", text="".join(parts))]
 
-def extract_font_family(filename):
-    \"\"\"从文件名提取字体家族名称\"\"\"
-    # 移除扩展名
-    name = Path(filename).stem
-    # 移除字重后缀
-    name = re.sub(r'-(Bold|Regular|Light|Medium|Thin|ExtraLight|SemiBold|Black|Heavy|Italic|BoldItalic|LightItalic|SemiBoldItalic|ExtraLightItalic)+$', '', name, flags=re.IGNORECASE)
-    # 在驼峰命名处添加空格
-    name = re.sub(r'([a-z])([A-Z])', r'\\1 \\2', name)
-    name = re.sub(r'([A-Z]+)([A-Z][a-z])', r'\\1 \\2', name)
-    return name.strip()
 
-# 使用绝对路径（从 server.py 传入）
-fonts_dir = Path(r"{fonts_dir_abs}")
-os.environ["MPLCONFIGDIR"] = r"{mpl_config_dir_abs}"
+# 单次安装的总超时
+PIP_INSTALL_TIMEOUT = 300
+# 同一虚拟环境同时只允许一个 pip install 修改 site-packages
+PIP_INSTALL_LOCK = asyncio.Lock()
+# pip list 需要导入 pip 的全部模块，耗时数百毫秒；结果在短时间内复用
+PACKAGE_LIST_TTL = 10.0
+# (过期时间, 结果)，python_install 结束后清空
+_package_list_cache: Optional[tuple[float, list[TextContent]]] = None
+# 已结束的 python_install 次数；pip list 运行期间有安装结束时，其结果不缓存
+_install_count = 0
+# pip 输出只保留最后若干行，以及更早出现的 ERROR/WARNING 行
+PIP_OUTPUT_TAIL_LINES = 200
 
-try:
-    import matplotlib
-    matplotlib.use('Agg')
-    import matplotlib.pyplot as plt
-    import matplotlib.font_manager as fm
 
-    # 动态加载 fonts/ 目录中的所有字体文件，并从文件名提取字体家族
-    font_families = set()
-    if fonts_dir.exists():
-        for ext in ["*.ttf", "*.otf", "*.ttc"]:
-            for font_file in fonts_dir.glob(ext):
-                try:
-                    # 使用绝对路径添加字体到 matplotlib
-                    font_path_abs = str(font_file.resolve())
-                    fm.fontManager.addfont(font_path_abs)
-                    # 从文件名提取字体家族名称
-                    family = extract_font_family(font_file.name)
-                    font_families.add(family)
-                except Exception:
-                    pass
-    
-    # 使用提取的字体家族配置 matplotlib
-    if font_families:
-        plt.rcParams['font.sans-serif'] = list(font_families) + ['DejaVu Sans']
-        plt.rcParams['axes.unicode_minus'] = False
-except ImportError:
-    pass
-except Exception:
-    # 确保字体配置失败不会影响代码执行
-    pass
-"""
+async def _read_pip_output(stream: asyncio.StreamReader) -> tuple[list[str], list[str], int]:
+    """Read pip output line by line with bounded memory.
 
-    # Create temporary script
-    script_path = Path(working_dir) / f"mcp_exec_{os.getpid()}.py"
-    script_path.write_text(font_config + "\n" + code)
-    
-    try:
-        result = subprocess.run(
-            [VENV_PYTHON, str(script_path)],
-            cwd=working_dir,
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
-        
-        output = f"=== Execution Result ===\n"
-        output += f"Exit Code: {result.returncode}\n\n"
-        
-        if result.stdout:
-            output += f"=== STDOUT ===\n{result.stdout}\n"
-        
-        if result.stderr:
-            output += f"=== STDERR ===\n{result.stderr}\n"
-        
-        if result.returncode == 0:
-            output += "\n✓ Execution completed successfully"
-        else:
-            output += f"\n✗ Execution failed with exit code {result.returncode}"
-        
-        return [TextContent(type="text", text=output)]
-    
-    finally:
-        if script_path.exists():
-            script_path.unlink()
+    Returns (earlier ERROR/WARNING lines, last PIP_OUTPUT_TAIL_LINES lines,
+    number of other lines dropped).
+    """
+    tail = collections.deque(maxlen=PIP_OUTPUT_TAIL_LINES)
+    issues = []
+    dropped = 0
+    async for raw in stream:
+        if len(tail) == tail.maxlen:
+            evicted = tail[0]
+            if evicted.startswith(("ERROR", "WARNING")) and len(issues) < PIP_OUTPUT_TAIL_LINES:
+                issues.append(evicted)
+            else:
+                dropped += 1
+        tail.append(raw.decode('utf-8', errors='replace').rstrip())
+    return issues, list(tail), dropped
 
 
 async def install_packages(args: dict) -> list[TextContent]:
     """Install Python packages using pip."""
+    global _package_list_cache, _install_count
     packages = args["packages"].strip()
     upgrade = args.get("upgrade", False)
+    try:
+        # 按 shell 规则拆分，引号内的版本约束（如 "numpy >= 1.26"）保持为一个参数
+        package_list = shlex.split(packages)
+    except ValueError as e:
+        return [TextContent(type="text", text=f"Error: Invalid package list: {e}")]
     
     cmd = [VENV_PYTHON, "-m", "pip", "install"]
     if upgrade:
         cmd.append("--upgrade")
-    cmd.extend(packages.split())
+    cmd.extend(package_list)
     
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        timeout=300
-    )
+    async with PIP_INSTALL_LOCK:
+        # stdin=DEVNULL prevents subprocess from inheriting MCP stdio
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            start_new_session=True,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=1024 * 1024,
+            **PIPE_OPTIONS,
+            env=CHILD_ENV
+        )
+        
+        try:
+            (issues, tail, dropped), _ = await asyncio.wait_for(
+                asyncio.gather(_read_pip_output(process.stdout), process.wait()),
+                timeout=PIP_INSTALL_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            await terminate_process(process)
+            return [TextContent(type="text", text=f"Package installation timed out after {PIP_INSTALL_TIMEOUT} seconds")]
+        finally:
+            # 即使安装失败或超时，site-packages 也可能已被部分修改
+            _package_list_cache = None
+            _install_count += 1
+    
+    parts = [
+        "=== Package Installation ===\n",
+        f"Command: {' '.join(cmd)}\n\n",
+    ]
     
-    output = f"=== Package Installation ===\n"
-    output += f"Command: {' '.join(cmd)}\n\n"
-    output += result.stdout
+    if issues:
+        parts.append("=== Earlier Errors/Warnings ===\n" + "\n".join(issues) + "\n\n")
     
-    if result.stderr:
-        output += f"\n=== STDERR ===\n{result.stderr}"
+    if dropped:
+        parts.append(f"... [{dropped} earlier lines omitted] ...\n")
+    parts.append("\n".join(tail))
     
-    if result.returncode == 0:
-        output += "\n\n✓ Installation completed successfully"
+    if process.returncode == 0:
+        parts.append("\n\n✓ Installation completed successfully")
     else:
-        output += f"\n\n✗ Installation failed with exit code {result.returncode}"
+        parts.append(f"\n\n✗ Installation failed with exit code {process.returncode}")
     
-    return [TextContent(type="text", text=output)]
+    return [TextContent(type="text", text="".join(parts))]
 
 
 async def run_script(args: dict) -> list[TextContent]:
@@ -344,119 +758,271 @@ async def run_script(args: dict) -> list[TextContent]:
     working_dir = args.get("working_dir", os.path.dirname(script_path))
     timeout = args.get("timeout", 60)
     
-    if not os.path.isfile(script_path):
-        return [TextContent(type="text", text=f"Error: Script not found: {script_path}")]
-    
     cmd = [VENV_PYTHON, script_path] + script_args
     
-    result = subprocess.run(
-        cmd,
-        cwd=working_dir,
-        capture_output=True,
-        text=True,
-        timeout=timeout
-    )
+    # 不预先检查脚本是否存在：解释器找不到脚本时会以退出码 2 报告，下面照常输出
+    try:
+        # stdin=DEVNULL prevents subprocess from inheriting MCP stdio
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=working_dir,
+            start_new_session=True,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            **PIPE_OPTIONS,
+            env=CHILD_ENV
+        )
+    except (FileNotFoundError, NotADirectoryError):
+        if "working_dir" not in args:
+            # 未指定 working_dir 时默认使用脚本所在目录，目录不存在即脚本不存在
+            return [TextContent(type="text", text=f"Error: Script not found: {script_path}")]
+        return [TextContent(type="text", text=f"Error: Working directory not found: {working_dir}")]
+    
+    stdout_buf, stderr_buf = OutputBuffer(), OutputBuffer()
+    timed_out = False
+    communicate = asyncio.ensure_future(_communicate(process, stdout_buf, stderr_buf))
+    try:
+        # shield：超时时不取消读取，脚本在 SIGTERM 处理函数或 atexit 中输出的内容仍能读到
+        await asyncio.wait_for(asyncio.shield(communicate), timeout=timeout)
+    except asyncio.TimeoutError:
+        # 已读到的输出仍保留在缓冲区中，随超时信息一起返回
+        await terminate_process(process)
+        timed_out = True
+        try:
+            # 进程组已结束，管道随之关闭；脱离进程组的后台进程可能仍持有管道，不无限等待
+            await asyncio.wait_for(communicate, timeout=KILL_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            pass
+    stdout, stderr = stdout_buf.getvalue(), stderr_buf.getvalue()
     
-    output = f"=== Script Execution ===\n"
-    output += f"Script: {script_path}\n"
-    output += f"Args: {script_args}\n"
-    output += f"Exit Code: {result.returncode}\n\n"
+    parts = [
+        "=== Script Execution ===\n",
+        f"Script: {script_path}\n",
+        f"Args: {script_args}\n",
+        f"Exit Code: {process.returncode}\n\n",
+    ]
     
-    if result.stdout:
-        output += f"=== STDOUT ===\n{result.stdout}\n"
+    if stdout:
+        # 解码结果直接放入 parts，避免再经 f-string 复制一遍（输出可能有数 MB）
+        parts.extend(("=== STDOUT ===\n", stdout.decode('utf-8', errors='replace'), "\n"))
     
-    if result.stderr:
-        output += f"=== STDERR ===\n{result.stderr}\n"
+    if stderr:
+        parts.extend(("=== STDERR ===\n", stderr.decode('utf-8', errors='replace'), "\n"))
     
-    if result.returncode == 0:
-        output += "\n✓ Script completed successfully"
+    if timed_out:
+        parts.append(f"\n✗ Script execution timed out after {timeout} seconds")
+    elif process.returncode == 0:
+        parts.append("\n✓ Script completed successfully")
     else:
-        output += f"\n✗ Script failed with exit code {result.returncode}"
+        parts.append(f"\n✗ Script failed with exit code {process.returncode}")
     
-    return [TextContent(type="text", text=output)]
+    return [TextContent(type="text", text="".join(parts))]
+
+
+# python_eval 快速路径：只含字面量和数值运算的表达式直接在 server 进程内求值
+FAST_EVAL_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod)
+FAST_EVAL_UNARYOPS = (ast.UAdd, ast.USub, ast.Not)
+# 乘方的底数和指数都必须是字面量，且指数不超过该值，避免 9**9**9 之类的表达式阻塞事件循环
+FAST_EVAL_MAX_EXPONENT = 1000
+# 只对不超过该长度的表达式走快速路径：限制了节点数和整数大小，
+# 否则 "99999**1000*99999**1000*..." 这类乘方之积仍会长时间阻塞事件循环
+FAST_EVAL_MAX_LENGTH = 200
+
+
+def _is_numeric(node: ast.AST) -> bool:
+    """数值字面量，或只由数值字面量组成的算术/比较/布尔表达式。"""
+    if isinstance(node, ast.Constant):
+        return type(node.value) in (int, float, complex, bool)
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, FAST_EVAL_UNARYOPS) and _is_numeric(node.operand)
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.Pow):
+            return (_is_numeric(node.left) and isinstance(node.left, ast.Constant)
+                    and isinstance(node.right, ast.Constant) and type(node.right.value) is int
+                    and abs(node.right.value) <= FAST_EVAL_MAX_EXPONENT)
+        return isinstance(node.op, FAST_EVAL_BINOPS) and _is_numeric(node.left) and _is_numeric(node.right)
+    if isinstance(node, ast.Compare):
+        return _is_numeric(node.left) and all(map(_is_numeric, node.comparators))
+    if isinstance(node, ast.BoolOp):
+        return all(map(_is_numeric, node.values))
+    return False
+
+
+def _is_fast_eval(node: ast.AST) -> bool:
+    """字面量、数值运算，以及由它们组成的容器。"""
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return all(map(_is_fast_eval, node.elts))
+    if isinstance(node, ast.Dict):
+        return None not in node.keys and all(map(_is_fast_eval, node.keys + node.values))
+    return _is_numeric(node)
+
+
+def fast_eval(expression: str) -> Optional[tuple[str, str]]:
+    """在 server 进程内求值简单表达式，返回 (结果, 类型名)；不适用或出错时返回 None，交给子进程处理。"""
+    # 子进程以 `result = <表达式>` 执行，开头有空白时会报缩进错误，保持一致
+    if expression[:1].isspace() or len(expression) > FAST_EVAL_MAX_LENGTH:
+        return None
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+    if not _is_fast_eval(tree.body):
+        return None
+    try:
+        result = eval(compile(tree, "<eval>", "eval"), {"__builtins__": {}})
+        return str(result).lstrip(), type(result).__name__
+    except Exception:
+        return None
 
 
 async def eval_expression(args: dict) -> list[TextContent]:
     """Evaluate a Python expression."""
     expression = args["expression"]
     
-    code = f"result = {expression}\nprint(result)\nprint(f'__TYPE__{{type(result).__name__}}')"
-    
-    script_path = Path("/tmp") / f"mcp_eval_{os.getpid()}.py"
-    script_path.write_text(code)
+    fast = fast_eval(expression)
+    if fast is not None:
+        value, type_info = fast
+        parts = [
+            "=== Expression Evaluation ===\n",
+            f"Expression: {expression}\n",
+            f"Result: {value}\n",
+            f"Type: {type_info}",
+        ]
+        return [TextContent(type="text", text="".join(parts))]
     
     try:
-        result = subprocess.run(
-            [VENV_PYTHON, str(script_path)],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+        # 与 python_execute 共用常驻 worker；worker 直接返回 str(结果) 和类型名，
+        # 无需从打印输出中解析
+        try:
+            exit_code, stdout, stderr, value, type_name = await WORKER_POOL.run("", expression, 10, mode=MODE_EVAL)
+        except asyncio.TimeoutError:
+            return [TextContent(type="text", text=f"Expression evaluation timed out: {expression}")]
         
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            value = '\n'.join(lines[:-1]) if len(lines) > 1 else lines[0]
-            type_info = lines[-1].replace('__TYPE__', '') if lines else 'unknown'
-            
-            output = f"=== Expression Evaluation ===\n"
-            output += f"Expression: {expression}\n"
-            output += f"Result: {value}\n"
-            output += f"Type: {type_info}"
+        if exit_code == 0:
+            parts = [
+                "=== Expression Evaluation ===\n",
+                f"Expression: {expression}\n",
+                f"Result: {value.decode('utf-8', errors='replace')}\n",
+                f"Type: {type_name.decode('utf-8', errors='replace')}",
+            ]
+            if stdout:
+                # 表达式求值过程中打印的内容
+                parts.extend(("\n\n=== STDOUT ===\n", stdout.decode('utf-8', errors='replace')))
         else:
-            output = f"Error evaluating expression:\n{expression}\n\n"
-            output += f"Error: {result.stderr}\n"
+            parts = [
+                f"Error evaluating expression:\n{expression}\n\n",
+                f"Error: {stderr.decode('utf-8', errors='replace')}\n",
+            ]
         
-        return [TextContent(type="text", text=output)]
+        return [TextContent(type="text", text="".join(parts))]
     
     except Exception as e:
-        error_msg = f"Error evaluating expression:\n{expression}\n\n"
-        error_msg += f"Error: {str(e)}\n"
-        error_msg += traceback.format_exc()
-        return [TextContent(type="text", text=error_msg)]
-    
-    finally:
-        if script_path.exists():
-            script_path.unlink()
+        parts = [
+            f"Error evaluating expression:\n{expression}\n\n",
+            f"Error: {str(e)}\n",
+            traceback.format_exc(),
+        ]
+        return [TextContent(type="text", text="".join(parts))]
 
 
-async def list_packages() -> list[TextContent]:
+async def list_packages(args: dict) -> list[TextContent]:
     """List installed Python packages."""
-    result = subprocess.run(
-        [VENV_PYTHON, "-m", "pip", "list", "--format=json"],
-        capture_output=True,
-        text=True
+    global _package_list_cache
+    now = asyncio.get_running_loop().time()
+    if _package_list_cache is not None and _package_list_cache[0] > now:
+        return _package_list_cache[1]
+    install_count = _install_count
+    
+    # stdin=DEVNULL prevents subprocess from inheriting MCP stdio
+    process = await asyncio.create_subprocess_exec(
+        VENV_PYTHON, "-m", "pip", "list", "--format=json",
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        **PIPE_OPTIONS,
+        env=CHILD_ENV
     )
     
-    if result.returncode == 0:
-        packages = json.loads(result.stdout)
-        output = "=== Installed Python Packages ===\n\n"
-        output += f"{'Package':<30} Version\n"
-        output += "=" * 50 + "\n"
-        
-        for pkg in sorted(packages, key=lambda x: x["name"].lower()):
-            output += f"{pkg['name']:<30} {pkg['version']}\n"
-        
-        output += f"\nTotal: {len(packages)} packages"
+    stdout, stderr = await process.communicate()
+    
+    if process.returncode == 0:
+        packages = _json.loads(stdout)
+        # 一次性生成 (小写名, 名称, 版本) 元组并排序，避免逐项调用 lambda
+        rows = sorted((pkg["name"].lower(), pkg["name"], pkg["version"]) for pkg in packages)
+        output = "".join([
+            "=== Installed Python Packages ===\n\n",
+            f"{'Package':<30} Version\n",
+            "=" * 50 + "\n",
+            *[f"{name:<30} {version}\n" for _, name, version in rows],
+            f"\nTotal: {len(packages)} packages",
+        ])
     else:
-        output = f"Error listing packages:\n{result.stderr}"
+        output = f"Error listing packages:\n{stderr.decode('utf-8', errors='replace')}"
+        return [TextContent(type="text", text=output)]
     
-    return [TextContent(type="text", text=output)]
+    result = [TextContent(type="text", text=output)]
+    # 安装进行中，或 pip list 运行期间有安装结束时，结果可能已经过时，不缓存
+    if not PIP_INSTALL_LOCK.locked() and install_count == _install_count:
+        _package_list_cache = (now + PACKAGE_LIST_TTL, result)
+    return result
+
+
+# 工具名 -> 实现函数
+TOOL_HANDLERS = {
+    "python_execute": execute_python,
+    "python_install": install_packages,
+    "python_run_script": run_script,
+    "python_eval": eval_expression,
+    "python_list_packages": list_packages,
+}
+
+# 工具名 -> 必填参数，取自 TOOLS 中声明的 inputSchema
+REQUIRED_ARGS = {tool.name: tool.inputSchema.get("required", []) for tool in TOOLS}
 
 
 # ============================================================
 # MAIN SERVER ENTRY POINT
 # ============================================================
 
+def use_pidfd_child_watcher() -> None:
+    """Python 3.12 之前默认为每个子进程启动一个 waitpid 线程，改为通过 pidfd 在事件循环中回收子进程。"""
+    if uvloop is not None or sys.version_info >= (3, 12) or not hasattr(os, "pidfd_open"):
+        # uvloop 自行回收子进程；3.12 起默认即使用 pidfd
+        return
+    try:
+        # 内核低于 5.3 时 pidfd_open 不可用
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return
+    watcher = asyncio.PidfdChildWatcher()
+    watcher.attach_loop(asyncio.get_running_loop())
+    asyncio.set_child_watcher(watcher)
+
+
 async def main():
     """Run the MCP server."""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    use_pidfd_child_watcher()
+    WORKER_POOL.start()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        await WORKER_POOL.shutdown()
+        shutil.rmtree(WORKER_SOURCE_DIR, ignore_errors=True)
 
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    if uvloop is not None and hasattr(uvloop, "run"):
+        uvloop.run(main())
+    else:
+        if uvloop is not None:
+            # uvloop 0.18 之前没有 uvloop.run，改为安装事件循环策略
+            uvloop.install()
+        asyncio.run(main())
@@ -7,70 +7,90 @@
 
 import os
 import sys
+import functools
 from pathlib import Path
-import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 # 获取脚本所在目录
 SCRIPT_DIR = Path(__file__).parent
 FONTS_DIR = SCRIPT_DIR / "fonts"
 FONTS_DIR.mkdir(exist_ok=True)
+# 链接/复制循环中直接拼接字符串路径，避免每个文件都构造 Path 对象
+FONTS_DIR_STR = os.fspath(FONTS_DIR)
 
+# 通用系统字体搜索路径（用户目录只在启动时解析一次）
+HOME_DIR = Path.home()
+FONT_SEARCH_PATHS = [
+    Path("/usr/share/fonts"),
+    Path("/usr/local/share/fonts"),
+    HOME_DIR / ".fonts",
+    HOME_DIR / ".local/share/fonts",
+]
 
+# 支持的字体文件扩展名（与文件名的小写形式比较，与 server.py 一致）
+FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+
+def iter_font_files(root):
+    """递归遍历目录，逐个返回字体文件的 DirEntry（一次遍历匹配所有扩展名，不进入目录符号链接）"""
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(FONT_EXTENSIONS) and entry.is_file():
+                    yield entry
+
+
+@functools.lru_cache(maxsize=1)
 def scan_font_directories():
-    """扫描系统字体目录，按文件夹分组返回所有字体家族"""
-    # 通用搜索路径
-    search_paths = [
-        Path("/usr/share/fonts"),
-        Path("/usr/local/share/fonts"),
-        Path.home() / ".fonts",
-        Path.home() / ".local/share/fonts",
-    ]
-    
+    """扫描系统字体目录，按文件夹分组返回所有字体家族（结果会被缓存，重新扫描前需调用 cache_clear）"""
     families = {}
     
-    for base_path in search_paths:
-        if not base_path.exists():
+    for base_path in FONT_SEARCH_PATHS:
+        # 不存在的目录直接由 scandir 报错跳过，无需预先检查
+        try:
+            it = os.scandir(base_path)
+        except OSError:
             continue
         
-        # 遍历所有子目录
-        for font_dir in base_path.iterdir():
-            if not font_dir.is_dir():
-                continue
-            
-            # 收集该目录下的所有字体文件
-            font_files = []
-            for ext in ["*.ttf", "*.otf", "*.ttc"]:
-                font_files.extend(font_dir.rglob(ext))
-            
-            if font_files:
-                # 使用目录名作为家族标识
-                family_key = f"{font_dir.parent.name}/{font_dir.name}"
-                if family_key not in families:
-                    families[family_key] = []
-                families[family_key].extend([f for f in font_files if f.is_file()])
-    
-    # 去重并排序
-    for key in families:
-        families[key] = sorted(set(families[key]))
+        # 遍历所有子目录（DirEntry 自带文件类型，普通目录无需额外 stat）
+        with it:
+            for font_dir in it:
+                if not font_dir.is_dir():
+                    continue
+                
+                # 收集该目录下的所有字体文件
+                font_files = [entry.path for entry in iter_font_files(font_dir.path)]
+                
+                if font_files:
+                    # 使用目录名作为家族标识；dict 作为有序集合，插入时即去重
+                    family_key = f"{base_path.name}/{font_dir.name}"
+                    families.setdefault(family_key, {}).update(dict.fromkeys(font_files))
     
-    return families
+    return {key: list(paths) for key, paths in families.items()}
 
 
-def display_font_families(families):
+def number_font_families(families):
+    """按名称排序一次，为字体目录分配从 1 开始的编号"""
+    return dict(enumerate(sorted(families), 1))
+
+
+def display_font_families(families, family_map):
     """显示字体家族列表"""
     print("\n找到以下字体目录:")
-    family_list = []
-    
-    for idx, (family_key, fonts) in enumerate(sorted(families.items()), 1):
-        print(f"  {idx}. {family_key} - {len(fonts)}个字体")
-        family_list.append(family_key)
-    
-    return family_list
+    for idx, family_key in family_map.items():
+        print(f"  {idx}. {family_key} - {len(families[family_key])}个字体")
 
 
-def select_families_interactive(families):
+def select_families_interactive(families, family_map):
     """交互式选择字体家族"""
-    family_list = display_font_families(families)
+    display_font_families(families, family_map)
     
     while True:
         choice = input("\n请输入要链接的字体目录编号 (多选用逗号分隔, 如: 1,3): ").strip()
@@ -83,11 +103,11 @@ def select_families_interactive(families):
             indices = [int(x.strip()) for x in choice.split(",")]
             selected = []
             for idx in indices:
-                if 1 <= idx <= len(family_list):
-                    selected.append(family_list[idx - 1])
-                else:
+                family_key = family_map.get(idx)
+                if family_key is None:
                     print(f"✗ 无效的编号: {idx}")
                     return None
+                selected.append(family_key)
             return selected
         except ValueError:
             print("✗ 输入格式错误，请输入数字")
@@ -103,56 +123,104 @@ def get_fonts_from_families(families, selected_family_keys):
     return fonts
 
 
+# 链接/复制字体时的最大并发线程数
+FONT_IO_WORKERS = 32
+
+
+def map_fonts(func, font_files):
+    """在线程池中对每个字体文件执行 func，返回 (字体, 结果, 异常) 列表；同名字体在同一线程中依次处理，结果与串行执行一致"""
+    groups = {}
+    for font_file in font_files:
+        groups.setdefault(os.path.basename(font_file), []).append(font_file)
+    if not groups:
+        return []
+    
+    def run_group(files):
+        results = []
+        for font_file in files:
+            try:
+                results.append((font_file, func(font_file), None))
+            except Exception as e:
+                results.append((font_file, None, e))
+        return results
+    
+    with ThreadPoolExecutor(max_workers=min(FONT_IO_WORKERS, len(groups))) as executor:
+        return [result for results in executor.map(run_group, groups.values()) for result in results]
+
+
+def link_font(font_file):
+    """为单个字体文件创建符号链接，返回链接路径"""
+    target = os.path.join(FONTS_DIR_STR, os.path.basename(font_file))
+    # 先直接创建，只有目标已存在时才删除后重建
+    try:
+        os.symlink(font_file, target)
+    except FileExistsError:
+        os.unlink(target)
+        os.symlink(font_file, target)
+    return target
+
+
+def copy_font(font_file):
+    """复制单个字体文件，返回目标路径"""
+    # 只有复制模式才需要 shutil，链接模式不必导入
+    import shutil
+    
+    target = os.path.join(FONTS_DIR_STR, os.path.basename(font_file))
+    # 先删除已有目标，避免 copy2 顺着旧的符号链接写入系统字体文件
+    try:
+        os.unlink(target)
+    except FileNotFoundError:
+        pass
+    shutil.copy2(font_file, target)
+    return target
+
+
 def link_fonts(font_files):
     """创建字体文件的符号链接"""
     linked = []
-    for font_file in font_files:
-        target = FONTS_DIR / font_file.name
-        try:
-            if target.exists() or target.is_symlink():
-                target.unlink()
-            os.symlink(font_file, target)
+    # 并发执行完成后再统一输出结果
+    for font_file, target, error in map_fonts(link_font, font_files):
+        name = os.path.basename(font_file)
+        if error is None:
             linked.append(target)
-            print(f"✓ 已链接: {font_file.name}")
-        except Exception as e:
-            print(f"✗ 链接失败 {font_file.name}: {e}")
+            print(f"✓ 已链接: {name}")
+        else:
+            print(f"✗ 链接失败 {name}: {error}")
     return linked
 
 
 def copy_fonts(font_files):
     """复制字体文件"""
     copied = []
-    for font_file in font_files:
-        target = FONTS_DIR / font_file.name
-        try:
-            if target.exists():
-                target.unlink()
-            shutil.copy2(font_file, target)
+    for font_file, target, error in map_fonts(copy_font, font_files):
+        name = os.path.basename(font_file)
+        if error is None:
             copied.append(target)
-            print(f"✓ 已复制: {font_file.name}")
-        except Exception as e:
-            print(f"✗ 复制失败 {font_file.name}: {e}")
+            print(f"✓ 已复制: {name}")
+        else:
+            print(f"✗ 复制失败 {name}: {error}")
     return copied
 
 
 def list_current_fonts():
-    """列出当前 fonts 文件夹中的字体"""
-    fonts = []
-    for ext in ["*.ttf", "*.otf", "*.ttc"]:
-        fonts.extend(FONTS_DIR.glob(ext))
-    return sorted(fonts)
+    """列出当前 fonts 文件夹中的字体，返回 (文件名, 字节数) 列表"""
+    # is_file() 对符号链接会 stat 并缓存结果，之后的 stat() 不再产生系统调用；失效的链接被跳过
+    with os.scandir(FONTS_DIR) as it:
+        return sorted(
+            (entry.name, entry.stat().st_size)
+            for entry in it
+            if entry.name.lower().endswith(FONT_EXTENSIONS) and entry.is_file()
+        )
 
 
 def link_directory(source_dir):
     """链接整个字体目录"""
-    source_path = Path(source_dir)
-    if not source_path.exists() or not source_path.is_dir():
+    if not os.path.isdir(source_dir):
         print(f"✗ 目录不存在: {source_dir}")
         return []
     
-    font_files = []
-    for ext in ["*.ttf", "*.otf", "*.ttc"]:
-        font_files.extend(source_path.rglob(ext))
+    # 只含字体文件的叶子目录只需一次 scandir，有子目录时才继续向下遍历
+    font_files = [entry.path for entry in iter_font_files(source_dir)]
     
     if not font_files:
         print("✗ 未找到字体文件")
@@ -208,9 +276,8 @@ def main():
             print("✗ fonts 文件夹中没有字体文件")
         else:
             print(f"共 {len(current_fonts)} 个字体文件:\n")
-            for font in current_fonts:
-                size = font.stat().st_size / 1024
-                print(f"  - {font.name} ({size:.1f} KB)")
+            for name, size in current_fonts:
+                print(f"  - {name} ({size / 1024:.1f} KB)")
         return
     
     # 链接目录
@@ -231,8 +298,8 @@ def main():
     # 列出当前字体
     current_fonts = list_current_fonts()
     print(f"\n当前 fonts 文件夹中的字体 ({len(current_fonts)} 个):")
-    for font in current_fonts:
-        print(f"  - {font.name}")
+    for name, _ in current_fonts:
+        print(f"  - {name}")
     
     # 查找系统字体（按目录分组）
     print("\n正在扫描系统字体目录...")
@@ -249,7 +316,7 @@ def main():
     
     # 自动模式：链接第一个字体目录
     if "auto" in args:
-        first_family = list(font_families.keys())[0]
+        first_family = next(iter(font_families))
         print(f"\n自动选择字体目录: {first_family}")
         fonts_to_link = font_families[first_family]
         print(f"找到 {len(fonts_to_link)} 个字体文件")
@@ -259,13 +326,20 @@ def main():
         print("\n下一步: 重启 MCP 服务器\n")
         return
     
-    # 交互式模式：显示字体目录供用户选择
+    # 交互式模式：显示字体目录供用户选择（编号只生成一次，重试时复用）
+    family_map = number_font_families(font_families)
     selected_families = None
     while selected_families is None:
-        selected_families = select_families_interactive(font_families)
+        selected_families = select_families_interactive(font_families, family_map)
         if selected_families is None:
-            retry = input("是否重新输入? (y/n): ").strip().lower()
-            if retry != 'y':
+            retry = input("是否重新输入? (y/n, r 重新扫描字体目录): ").strip().lower()
+            if retry == 'r':
+                # 只有用户要求时才清除缓存重新遍历字体目录
+                scan_font_directories.cache_clear()
+                font_families = scan_font_directories()
+                family_map = number_font_families(font_families)
+                print(f"✓ 找到 {len(font_families)} 个字体目录")
+            elif retry != 'y':
                 print("\n未执行任何操作")
                 return
     
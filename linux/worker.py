@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+LLM-Py-Phy-MCP Worker
+常驻 Python 解释器：由 server.py 启动并复用，避免每次执行代码都重新启动解释器
+
+用法: python worker.py <max_output_bytes> <source_dir> [preamble]
+每次请求的代码会写入 source_dir 下本 worker 专用的源文件，并作为 __main__.__file__，
+这样 multiprocessing 的 spawn/forkserver 子进程能重新导入用户定义的函数，
+traceback 也能显示源码行。
+preamble 为初始化脚本（如字体配置），启动时执行一次，
+其全局变量会作为之后每次执行的初始命名空间。
+环境变量 MCP_PYTHON_PRELOAD 可指定启动时预先导入的模块（逗号分隔，如 "numpy,pandas"），
+之后每次执行中的 import 直接命中 sys.modules。
+
+协议 (stdin/stdout，长度前缀，大端序):
+  就绪: 启动完成后先发送一帧响应，内容为初始化脚本的执行结果
+  请求: struct "!BII" (mode, len(cwd), len(code)) + cwd + code      (UTF-8)
+        mode 为 MODE_EXEC（执行代码）或 MODE_EVAL（对单个表达式求值）
+  响应: struct "!iBIIII" (exit_code, retire, len(stdout), len(stderr), len(value),
+        len(type)) + stdout + stderr + value + type
+        value/type 为表达式结果的 str() 和类型名（UTF-8），仅 MODE_EVAL 成功时非空；
+        retire 非 0 表示 worker 不能再复用（用户代码留下了仍在运行的线程，
+        或输出超过上限被中止），server 应终止该 worker
+
+捕获的输出超过 max_output 的 CAPTURE_LIMIT_FACTOR 倍时，worker 中止本次执行：
+返回已捕获的部分并退出，避免无限输出耗尽内存（memfd 没有大小上限）。
+
+每次请求结束后恢复 sys.argv、sys.path、os.environ，并卸载本次请求导入的本地模块
+（标准库和 site-packages 中的模块保留，C 扩展无法在同一进程中重新加载）。
+matplotlib 的 rcParams 和 numpy 的打印选项也恢复为初始化脚本执行后的值，
+避免一次请求的设置（如覆盖中文字体）影响之后的请求。
+"""
+
+import os
+import sys
+import copy
+import site
+import struct
+import runpy
+import builtins
+import linecache
+import sysconfig
+import tempfile
+import threading
+import time
+import traceback
+import types
+
+REQUEST_HEADER = struct.Struct("!BII")
+RESPONSE_HEADER = struct.Struct("!iBIIII")
+MODE_EXEC = 0
+MODE_EVAL = 1
+# numpy 文档中的默认打印选项，用于恢复初始化后才导入的 numpy
+NUMPY_PRINT_DEFAULTS = {
+    "edgeitems": 3,
+    "threshold": 1000,
+    "floatmode": "maxprec",
+    "precision": 8,
+    "suppress": False,
+    "linewidth": 75,
+    "nanstr": "nan",
+    "infstr": "inf",
+    "sign": "-",
+    "formatter": None,
+    "legacy": False,
+}
+# 捕获文件的大小上限（max_output 的倍数）及检查间隔
+CAPTURE_LIMIT_FACTOR = 4
+CAPTURE_POLL_INTERVAL = 0.05
+
+
+def read_exactly(stream, size: int) -> bytes:
+    """从协议管道读取 size 字节，管道关闭时抛出 EOFError。"""
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError
+    return data
+
+
+def exit_code_of(exc: SystemExit) -> int:
+    """按解释器的规则把 SystemExit 转换为退出码。"""
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        # 与进程退出码一样只保留低 8 位
+        return exc.code & 0xFF
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def write_source(path: str, code: str) -> None:
+    """把本次请求的代码写入源文件，并登记到 linecache 供 traceback 使用。"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(code)
+    # mtime 为 None 的条目不会被 linecache.checkcache 清除
+    linecache.cache[path] = (len(code), None, code.splitlines(True), path)
+
+
+def run_code(
+    code: str, filename: str, cwd: str, namespace: dict, mode: int
+) -> tuple[int, bytes, bytes]:
+    """在给定命名空间中执行代码或对表达式求值。
+
+    返回 (退出码, 结果的 str(), 结果类型名)；退出码与 `python -` 一致，
+    MODE_EXEC 或出错时后两项为空。
+    """
+    try:
+        if cwd:
+            os.chdir(cwd)
+        if mode == MODE_EVAL:
+            result = eval(compile(code, filename, "eval"), namespace)
+            return (
+                0,
+                str(result).encode("utf-8", errors="backslashreplace"),
+                type(result).__name__.encode("utf-8", errors="backslashreplace"),
+            )
+        exec(compile(code, filename, "exec"), namespace)
+    except SystemExit as e:
+        return exit_code_of(e), b"", b""
+    except BaseException:
+        # 跳过 worker 自身的栈帧，只显示用户代码的 traceback
+        etype, value, tb = sys.exc_info()
+        traceback.print_exception(etype, value, tb.tb_next)
+        return 1, b"", b""
+    return 0, b"", b""
+
+
+def run_preamble(path: str) -> tuple[int, dict]:
+    """执行初始化脚本，返回退出码和脚本定义的公开名字。"""
+    try:
+        namespace = runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        return exit_code_of(e), {}
+    except BaseException:
+        traceback.print_exc()
+        return 1, {}
+    return 0, {k: v for k, v in namespace.items() if not k.startswith("__")}
+
+
+def preload_modules(names: str) -> None:
+    """预先导入常用模块；导入失败只影响性能，忽略即可。"""
+    for name in names.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+
+def library_dirs() -> tuple[str, ...]:
+    """标准库和 site-packages 所在目录，从中加载的模块在请求之间保留。"""
+    paths = {sys.prefix, sys.exec_prefix, sys.base_prefix, sys.base_exec_prefix}
+    paths.update(sysconfig.get_paths().values())
+    paths.add(site.getusersitepackages())
+    return tuple(
+        os.path.join(os.path.normcase(os.path.abspath(path)), "")
+        for path in paths
+        if path
+    )
+
+
+def snapshot_state() -> tuple:
+    """记录请求之间需要保持不变的进程状态。"""
+    return (
+        set(sys.modules),
+        list(sys.argv),
+        list(sys.path),
+        dict(os.environ),
+        set(threading.enumerate()),
+    )
+
+
+def restore_state(state: tuple, libraries: tuple[str, ...]) -> bool:
+    """撤销一次请求对进程状态的修改，返回是否有用户线程仍在运行。"""
+    modules, argv, path, environ, threads = state
+    for name in [name for name in sys.modules if name not in modules]:
+        filename = getattr(sys.modules[name], "__file__", None)
+        if not filename:
+            continue
+        # 卸载本地模块，使用户修改后的文件在下次 import 时生效
+        if not os.path.normcase(os.path.abspath(filename)).startswith(libraries):
+            del sys.modules[name]
+    sys.argv[:] = argv
+    sys.path[:] = path
+    for key in [key for key in os.environ if key not in environ]:
+        del os.environ[key]
+    for key, value in environ.items():
+        if os.environ.get(key) != value:
+            os.environ[key] = value
+    return any(thread not in threads for thread in threading.enumerate())
+
+
+def snapshot_options() -> dict:
+    """记录常用库的全局设置：matplotlib rcParams 和 numpy 打印选项。"""
+    options = {}
+    if "matplotlib" in sys.modules:
+        # 与 matplotlib.rc_context 一致，不记录 backend
+        rc = dict(sys.modules["matplotlib"].rcParams.copy())
+        del rc["backend"]
+        options["matplotlib"] = copy.deepcopy(rc)
+    if "numpy" in sys.modules:
+        options["numpy"] = sys.modules["numpy"].get_printoptions()
+    return options
+
+
+def restore_options(options: dict) -> None:
+    """恢复 snapshot_options 记录的设置；之后才导入的库恢复为其默认设置。"""
+    matplotlib = sys.modules.get("matplotlib")
+    if matplotlib is not None:
+        rc = options.get("matplotlib")
+        if rc is None:
+            rc = dict(matplotlib.rcParamsOrig.copy())
+            del rc["backend"]
+        # 深拷贝：用户可能原地修改列表值（如 rcParams["font.sans-serif"].insert）；
+        # 与 rc_context 一样绕过校验直接写回
+        dict.update(matplotlib.rcParams, copy.deepcopy(rc))
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        numpy.set_printoptions(**options.get("numpy", NUMPY_PRINT_DEFAULTS))
+
+
+def read_capture(capture, limit: int) -> bytes:
+    """读取捕获文件，超过 limit 字节时只保留开头和结尾各一半。"""
+    size = os.fstat(capture.fileno()).st_size
+    capture.seek(0)
+    if size <= limit:
+        return capture.read(size)
+    half = limit // 2
+    head = capture.read(half)
+    capture.seek(size - half)
+    tail = capture.read(half)
+    marker = f"\n... [truncated {size - 2 * half} bytes] ...\n".encode()
+    return b"".join((head, marker, tail))
+
+
+def open_capture(name: str):
+    """创建捕获文件：Linux 上使用 memfd（纯内存，不经过文件系统），否则使用临时文件。"""
+    if hasattr(os, "memfd_create"):
+        try:
+            return os.fdopen(os.memfd_create(name), "w+b")
+        except OSError:
+            pass
+    return tempfile.TemporaryFile()
+
+
+def reset_capture(capture) -> None:
+    """清空捕获文件，供下一次请求复用。"""
+    capture.seek(0)
+    capture.truncate()
+
+
+def write_all(fd: int, chunks) -> None:
+    """把多个缓冲区写到 fd；支持 writev 时一次系统调用写出，无需先拼接。"""
+    views = [memoryview(chunk) for chunk in chunks if chunk]
+    while views:
+        if hasattr(os, "writev"):
+            written = os.writev(fd, views)
+        else:
+            written = os.write(fd, views[0])
+        # 管道写入可能不完整，丢弃已写出的部分后继续
+        while views and written >= len(views[0]):
+            written -= len(views[0])
+            views.pop(0)
+        if written:
+            views[0] = views[0][written:]
+
+
+def flush_output(real_stdout, real_stderr) -> None:
+    """刷新用户代码可能替换过的 sys.stdout/sys.stderr，并恢复原始对象。"""
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    sys.stdout, sys.stderr = real_stdout, real_stderr
+    real_stdout.flush()
+    real_stderr.flush()
+
+
+def main():
+    max_output = int(sys.argv[1])
+    source_path = os.path.join(
+        os.path.abspath(sys.argv[2]), f"worker_{os.getpid()}.py"
+    )
+    preamble = sys.argv[3] if len(sys.argv) > 3 else None
+
+    # 协议管道只保留私有副本；用户代码看到的 stdin 为空设备
+    proto_in = os.fdopen(os.dup(0), "rb")
+    proto_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+
+    # fd 1/2 指向可复用的捕获文件，这样子进程和 C 扩展的输出也能被捕获
+    out_capture = open_capture("mcp_stdout")
+    err_capture = open_capture("mcp_stderr")
+    os.dup2(out_capture.fileno(), 1)
+    os.dup2(err_capture.fileno(), 2)
+
+    # 响应由主线程或 watch_captures 线程发送，二者互斥
+    respond_lock = threading.Lock()
+
+    def send_response(
+        exit_code: int, retire: bool, value: bytes, type_name: bytes, note: bytes
+    ) -> None:
+        stdout = read_capture(out_capture, max_output)
+        stderr = read_capture(err_capture, max_output) + note
+        reset_capture(out_capture)
+        reset_capture(err_capture)
+        header = RESPONSE_HEADER.pack(
+            exit_code, retire, len(stdout), len(stderr), len(value), len(type_name)
+        )
+        write_all(proto_out, (header, stdout, stderr, value, type_name))
+
+    def respond(
+        exit_code: int, retire: bool = False, value: bytes = b"", type_name: bytes = b""
+    ) -> None:
+        with respond_lock:
+            send_response(exit_code, retire, value, type_name, b"")
+
+    def watch_captures() -> None:
+        """输出超过上限时返回已捕获的部分并结束 worker。"""
+        limit = max_output * CAPTURE_LIMIT_FACTOR
+        while True:
+            time.sleep(CAPTURE_POLL_INTERVAL)
+            with respond_lock:
+                size = max(
+                    os.fstat(out_capture.fileno()).st_size,
+                    os.fstat(err_capture.fileno()).st_size,
+                )
+                if size <= limit:
+                    continue
+                note = f"\nOutput exceeded {limit} bytes; execution aborted\n"
+                send_response(1, True, b"", b"", note.encode())
+                os._exit(1)
+
+    threading.Thread(target=watch_captures, daemon=True).start()
+
+    # 与 `python -` 保持一致
+    sys.argv = ["-"]
+    sys.path[0] = ""
+    home_dir = os.getcwd()
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    main_module = sys.modules["__main__"]
+
+    base_namespace = {}
+    exit_code = 0
+    if preamble:
+        exit_code, base_namespace = run_preamble(preamble)
+        flush_output(real_stdout, real_stderr)
+        sys.modules["__main__"] = main_module
+    preload_modules(os.environ.get("MCP_PYTHON_PRELOAD", ""))
+    flush_output(real_stdout, real_stderr)
+    libraries = library_dirs()
+    state = snapshot_state()
+    options = snapshot_options()
+    respond(exit_code)
+
+    while True:
+        try:
+            mode, cwd_len, code_len = REQUEST_HEADER.unpack(
+                read_exactly(proto_in, REQUEST_HEADER.size)
+            )
+            cwd = read_exactly(proto_in, cwd_len).decode("utf-8")
+            code = read_exactly(proto_in, code_len).decode("utf-8")
+        except EOFError:
+            # server 关闭了管道，正常退出
+            break
+
+        # 每次执行都使用新的 __main__ 模块，仅继承初始化脚本定义的名字
+        module = types.ModuleType("__main__")
+        module.__dict__["__builtins__"] = builtins
+        module.__dict__.update(base_namespace)
+        module.__dict__["__file__"] = source_path
+        sys.modules["__main__"] = module
+
+        write_source(source_path, code)
+        exit_code, value, type_name = run_code(
+            code, source_path, cwd, module.__dict__, mode
+        )
+
+        flush_output(real_stdout, real_stderr)
+        sys.modules["__main__"] = main_module
+        try:
+            os.chdir(home_dir)
+        except OSError:
+            pass
+        if "matplotlib.pyplot" in sys.modules:
+            # 释放本次执行创建的图形，避免在请求之间累积
+            try:
+                sys.modules["matplotlib.pyplot"].close("all")
+            except Exception:
+                pass
+        try:
+            restore_options(options)
+        except Exception:
+            pass
+
+        retire = restore_state(state, libraries)
+        respond(exit_code, retire, value, type_name)
+
+    try:
+        os.unlink(source_path)
+    except OSError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
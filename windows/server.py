@@ -7,13 +7,23 @@ Provides Python code execution in isolated virtual environment with full system
 
 import sys
 import os
+import ast
 import asyncio
-import subprocess
 import traceback
-import json
+import collections
+import functools
+import shlex
+import shutil
+import struct
 import tempfile
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+
+try:
+    # 可选依赖：orjson 解析 pip list 的 JSON 输出更快
+    import orjson as _json
+except ImportError:
+    import json as _json
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
@@ -25,13 +35,19 @@ from mcp.types import Tool, TextContent
 # ============================================================
 
 
+@functools.lru_cache(maxsize=None)
+def is_in_venv() -> bool:
+    """检查是否在虚拟环境中运行。"""
+    return hasattr(sys, "real_prefix") or (
+        hasattr(sys, "base_prefix") and sys.base_prefix != sys.prefix
+    )
+
+
+@functools.lru_cache(maxsize=None)
 def get_venv_python() -> str:
     """获取虚拟环境的 Python 解释器路径。"""
     # 检查是否已在虚拟环境中
-    in_venv = hasattr(sys, "real_prefix") or (
-        hasattr(sys, "base_prefix") and sys.base_prefix != sys.prefix
-    )
-    if in_venv:
+    if is_in_venv():
         return sys.executable
 
     # 在脚本目录中查找虚拟环境（Windows 优先）
@@ -50,13 +66,6 @@ def get_venv_python() -> str:
     return sys.executable
 
 
-def is_in_venv() -> bool:
-    """检查是否在虚拟环境中运行。"""
-    return hasattr(sys, "real_prefix") or (
-        hasattr(sys, "base_prefix") and sys.base_prefix != sys.prefix
-    )
-
-
 # Initialize venv paths
 VENV_PYTHON = get_venv_python()
 VENV_INFO = {"in_venv": is_in_venv(), "python_path": VENV_PYTHON}
@@ -65,6 +74,278 @@ VENV_INFO = {"in_venv": is_in_venv(), "python_path": VENV_PYTHON}
 TEMP_DIR = tempfile.gettempdir()
 
 
+# ============================================================
+# SUBPROCESS OUTPUT CAPTURE
+# ============================================================
+
+
+# 子进程统一以 UTF-8 输出，与 server 端的解码方式一致，不受系统代码页影响
+CHILD_ENV = {**os.environ, "PYTHONIOENCODING": "utf-8"}
+
+# 单个输出流在内存中保留的最大字节数，超出部分只计数不保存
+MAX_INLINE_OUTPUT = 16 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class OutputBuffer:
+    """Keeps the head and tail of a stream, about MAX_INLINE_OUTPUT bytes in total."""
+
+    def __init__(self):
+        self.half = MAX_INLINE_OUTPUT // 2
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        room = self.half - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if chunk:
+            self.tail += chunk
+            # 攒够一倍再裁剪，使裁剪的拷贝开销按字节均摊
+            if len(self.tail) > 2 * self.half:
+                del self.tail[:-self.half]
+
+    def getvalue(self) -> bytes:
+        tail = self.tail[-self.half:]
+        dropped = self.size - len(self.head) - len(tail)
+        if not dropped:
+            return bytes(self.head + tail)
+        marker = f"\n... [truncated {dropped} bytes] ...\n".encode()
+        return b"".join((self.head, marker, tail))
+
+
+async def _drain(stream: asyncio.StreamReader, buf: OutputBuffer) -> None:
+    """Read a pipe until EOF into buf."""
+    while True:
+        chunk = await stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        buf.write(chunk)
+
+
+async def _communicate(
+    process: asyncio.subprocess.Process, stdout: OutputBuffer, stderr: OutputBuffer
+) -> None:
+    """Like process.communicate(), but with bounded memory per stream.
+
+    Output goes into the caller's buffers, so it is still available if the
+    call is cancelled (e.g. on timeout).
+    """
+    await asyncio.gather(_drain(process.stdout, stdout), _drain(process.stderr, stderr))
+    await process.wait()
+
+
+# ============================================================
+# PERSISTENT WORKER POOL
+# ============================================================
+
+
+# worker.py 在常驻解释器中执行代码，省去每次调用的解释器启动
+WORKER_SCRIPT = Path(__file__).parent / "worker.py"
+WORKER_POOL_SIZE = 2
+# 每个 worker 执行多少次请求后回收，限制用户代码残留的全局状态
+WORKER_MAX_REQUESTS = 50
+# worker 把每次请求的代码写入该目录下的源文件（见 worker.py），server 退出时删除
+WORKER_SOURCE_DIR = tempfile.mkdtemp(prefix="mcp_worker_")
+
+# 协议格式见 worker.py
+REQUEST_HEADER = struct.Struct("!BII")
+RESPONSE_HEADER = struct.Struct("!iBIIII")
+MODE_EXEC = 0
+MODE_EVAL = 1
+# (exit_code, stdout, stderr, value, type)；value/type 仅 MODE_EVAL 求值成功时非空
+WorkerResponse = tuple[int, bytes, bytes, bytes, bytes]
+
+
+class Worker:
+    """A long-lived interpreter running worker.py."""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.requests = 0
+        # worker 报告用户代码留下了仍在运行的线程，不能再复用
+        self.retire = False
+
+    @classmethod
+    async def spawn(cls, preamble: Optional[str]) -> "Worker":
+        """Start a worker and wait until it has run the preamble script."""
+        cmd = [
+            VENV_PYTHON,
+            str(WORKER_SCRIPT),
+            str(MAX_INLINE_OUTPUT),
+            WORKER_SOURCE_DIR,
+        ]
+        if preamble:
+            cmd.append(preamble)
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=CHILD_ENV,
+        )
+        worker = cls(process)
+        try:
+            # worker 执行完初始化脚本后发送一帧就绪响应
+            exit_code, _, stderr, _, _ = await worker._read_response()
+        except BaseException:
+            worker.kill()
+            raise
+        if exit_code != 0:
+            print(
+                f"警告: 初始化脚本执行失败 (exit code {exit_code}): {preamble}\n"
+                + stderr.decode("utf-8", errors="replace"),
+                file=sys.stderr,
+            )
+        return worker
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    async def run(self, cwd: str, code: str, mode: int) -> WorkerResponse:
+        """Send one request and return the worker's response."""
+        cwd_bytes = cwd.encode("utf-8")
+        code_bytes = code.encode("utf-8")
+        self.process.stdin.write(
+            REQUEST_HEADER.pack(mode, len(cwd_bytes), len(code_bytes))
+            + cwd_bytes
+            + code_bytes
+        )
+        await self.process.stdin.drain()
+        response = await self._read_response()
+        self.requests += 1
+        return response
+
+    async def _read_response(self) -> WorkerResponse:
+        header = await self.process.stdout.readexactly(RESPONSE_HEADER.size)
+        exit_code, retire, *lengths = RESPONSE_HEADER.unpack(header)
+        self.retire = bool(retire)
+        # 各字段紧邻，一次读出后再按长度切分
+        payload = await self.process.stdout.readexactly(sum(lengths))
+        fields = []
+        start = 0
+        for length in lengths:
+            fields.append(payload[start : start + length])
+            start += length
+        return (exit_code, *fields)
+
+    def close(self) -> None:
+        """Ask the worker to exit by closing its request pipe."""
+        if self.alive:
+            self.process.stdin.close()
+
+    def kill(self) -> None:
+        if self.alive:
+            self.process.kill()
+
+
+class WorkerPool:
+    """Keeps up to `size` warm workers; extra concurrent calls get a fresh one."""
+
+    def __init__(self, preamble: Optional[str], size: int, max_requests: int):
+        self.preamble = preamble
+        self.size = size
+        self.max_requests = max_requests
+        self._idle: list[Worker] = []
+        self._pending: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Warm up the pool in the background."""
+        self._refill()
+
+    async def acquire(self) -> Worker:
+        while self._idle:
+            worker = self._idle.pop()
+            if worker.alive:
+                return worker
+        return await Worker.spawn(self.preamble)
+
+    def release(self, worker: Worker) -> None:
+        """Return a healthy worker to the pool, or retire it."""
+        if worker.retire:
+            # 遗留的线程会阻止 worker 正常退出，且其输出会混入后续请求
+            self.discard(worker)
+            return
+        if (
+            worker.alive
+            and worker.requests < self.max_requests
+            and len(self._idle) < self.size
+        ):
+            self._idle.append(worker)
+        else:
+            worker.close()
+        self._refill()
+
+    def discard(self, worker: Worker) -> None:
+        """Kill a worker whose state is unknown (timeout, broken pipe)."""
+        worker.kill()
+        self._refill()
+
+    async def run(
+        self, cwd: str, code: str, timeout: float, mode: int = MODE_EXEC
+    ) -> WorkerResponse:
+        """Run code in a pooled worker; a timed-out worker is killed, not reused."""
+        worker = await self.acquire()
+        try:
+            result = await asyncio.wait_for(
+                worker.run(cwd, code, mode), timeout=timeout
+            )
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # 用户代码终止了 worker 进程（如 os._exit 或崩溃），该次输出无法取回
+            self.discard(worker)
+            exit_code = await worker.process.wait()
+            stderr = (
+                f"Python worker exited unexpectedly with code {exit_code}; "
+                "output was lost\n"
+            ).encode()
+            return exit_code, b"", stderr, b"", b""
+        except BaseException:
+            self.discard(worker)
+            raise
+        self.release(worker)
+        return result
+
+    def close(self) -> None:
+        for task in self._pending:
+            task.cancel()
+        for worker in self._idle:
+            worker.close()
+        self._idle.clear()
+
+    async def shutdown(self) -> None:
+        """Close all workers and wait for them to exit before the loop closes."""
+        workers = list(self._idle)
+        self.close()
+        await asyncio.gather(*(worker.process.wait() for worker in workers))
+
+    def _refill(self) -> None:
+        while len(self._idle) + len(self._pending) < self.size:
+            task = asyncio.create_task(Worker.spawn(self.preamble))
+            self._pending.add(task)
+            task.add_done_callback(self._on_spawned)
+
+    def _on_spawned(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            print(
+                f"警告: Python worker 启动失败: {task.exception()!r}", file=sys.stderr
+            )
+            return
+        worker = task.result()
+        if len(self._idle) < self.size:
+            self._idle.append(worker)
+        else:
+            worker.close()
+
+
+WORKER_POOL = WorkerPool(None, WORKER_POOL_SIZE, WORKER_MAX_REQUESTS)
+
+
 # ============================================================
 # MCP SERVER SETUP
 # ============================================================
@@ -72,97 +353,117 @@ TEMP_DIR = tempfile.gettempdir()
 app = Server("python-executor")
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available Python execution tools."""
-    return [
-        Tool(
-            name="python_execute",
-            description="执行Python代码，支持完整系统访问、包导入、多行代码，返回stdout/stderr",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "code": {"type": "string", "description": "要执行的Python代码(在一个代码块中完成所有操作)"},
-                    "working_dir": {
-                        "type": "string",
-                        "description": f"工作目录(可选，默认{TEMP_DIR})",
-                    },
-                    "timeout": {"type": "number", "description": "超时秒数(默认30)"},
+# 工具定义是静态的，只在模块加载时构建一次
+TOOLS = [
+    Tool(
+        name="python_execute",
+        description="执行Python代码，支持完整系统访问、包导入、多行代码，返回stdout/stderr",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "code": {"type": "string", "description": "要执行的Python代码(在一个代码块中完成所有操作)"},
+                "working_dir": {
+                    "type": "string",
+                    "description": f"工作目录(可选，默认{TEMP_DIR})",
                 },
-                "required": ["code"],
+                "timeout": {"type": "number", "description": "超时秒数(默认30)"},
             },
-        ),
-        Tool(
-            name="python_install",
-            description="使用pip安装Python包，支持单个或多个包",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "packages": {
-                        "type": "string",
-                        "description": "包名(空格分隔，如'numpy pandas')",
-                    },
-                    "upgrade": {
-                        "type": "boolean",
-                        "description": "是否升级(默认false)",
-                    },
+            "required": ["code"],
+        },
+    ),
+    Tool(
+        name="python_install",
+        description="使用pip安装Python包，支持单个或多个包",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "packages": {
+                    "type": "string",
+                    "description": "包名(空格分隔，如'numpy pandas'；含空格的版本约束需加引号)",
                 },
-                "required": ["packages"],
-            },
-        ),
-        Tool(
-            name="python_run_script",
-            description="运行Python脚本文件",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "script_path": {"type": "string", "description": "脚本绝对路径"},
-                    "args": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "命令行参数",
-                    },
-                    "working_dir": {"type": "string", "description": "工作目录(可选)"},
-                    "timeout": {"type": "number", "description": "超时秒数(默认60)"},
+                "upgrade": {
+                    "type": "boolean",
+                    "description": "是否升级(默认false)",
                 },
-                "required": ["script_path"],
             },
-        ),
-        Tool(
-            name="python_eval",
-            description="快速求值Python表达式并返回结果",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "expression": {"type": "string", "description": "要求值的表达式"}
+            "required": ["packages"],
+        },
+    ),
+    Tool(
+        name="python_run_script",
+        description="运行Python脚本文件",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "script_path": {"type": "string", "description": "脚本绝对路径"},
+                "args": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "命令行参数",
                 },
-                "required": ["expression"],
+                "working_dir": {"type": "string", "description": "工作目录(可选)"},
+                "timeout": {"type": "number", "description": "超时秒数(默认60)"},
             },
-        ),
-        Tool(
-            name="python_list_packages",
-            description="列出所有已安装的Python包",
-            inputSchema={"type": "object", "properties": {}, "required": []},
-        ),
-    ]
+            "required": ["script_path"],
+        },
+    ),
+    Tool(
+        name="python_eval",
+        description="快速求值Python表达式并返回结果",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "expression": {"type": "string", "description": "要求值的表达式"}
+            },
+            "required": ["expression"],
+        },
+    ),
+    Tool(
+        name="python_list_packages",
+        description="列出所有已安装的Python包",
+        inputSchema={"type": "object", "properties": {}, "required": []},
+    ),
+]
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available Python execution tools."""
+    return TOOLS
+
+
+# MCP 框架为每个请求单独起任务，并发调用会同时执行；限制同时运行的工具调用数，
+# 避免大量并发请求一次性启动过多解释器进程
+MAX_CONCURRENT_CALLS = max(4, os.cpu_count() or 1)
+CALL_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
+# python_install 已由 PIP_INSTALL_LOCK 串行执行，不占并发名额，
+# 否则排队等锁的安装（每次最长 PIP_INSTALL_TIMEOUT 秒）会挡住其他工具调用
+UNLIMITED_TOOLS = {"python_install"}
 
 
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     """Handle tool execution."""
     try:
-        if name == "python_execute":
-            return await execute_python(arguments)
-        elif name == "python_install":
-            return await install_packages(arguments)
-        elif name == "python_run_script":
-            return await run_script(arguments)
-        elif name == "python_eval":
-            return await eval_expression(arguments)
-        elif name == "python_list_packages":
-            return await list_packages()
-        else:
+        handler = TOOL_HANDLERS.get(name)
+        if handler is None:
             return [TextContent(type="text", text=f"Unknown tool: {name}")]
+        # 只在调用前检查必填参数；处理函数内部的 KeyError 属于 server 自身的错误
+        missing = [key for key in REQUIRED_ARGS[name] if key not in arguments]
+        if missing:
+            return [
+                TextContent(
+                    type="text",
+                    text=f"Missing required argument for {name}: {missing[0]}",
+                )
+            ]
+        if name in UNLIMITED_TOOLS:
+            return await handler(arguments)
+        async with CALL_SEMAPHORE:
+            return await handler(arguments)
+    except asyncio.TimeoutError:
+        # 预期内的错误只返回简短说明，不格式化 server 自身的 traceback
+        return [TextContent(type="text", text=f"Tool {name} timed out")]
     except Exception as e:
         error_msg = f"Error executing {name}:\n{traceback.format_exc()}"
         return [TextContent(type="text", text=error_msg)]
@@ -179,97 +480,155 @@ async def execute_python(args: dict) -> list[TextContent]:
     working_dir = args.get("working_dir", TEMP_DIR)
     timeout = args.get("timeout", 30)
 
-    # Create temporary script
-    script_path = Path(working_dir) / f"mcp_exec_{os.getpid()}.py"
-    script_path.write_text(code, encoding="utf-8")
-
+    # Run in a warm worker instead of starting a new interpreter
     try:
-        # CRITICAL FIX: stdin=DEVNULL prevents subprocess from inheriting MCP stdio
-        process = await asyncio.create_subprocess_exec(
-            VENV_PYTHON,
-            str(script_path),
-            cwd=working_dir,
-            stdin=asyncio.subprocess.DEVNULL,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
+        exit_code, stdout, stderr, _, _ = await WORKER_POOL.run(
+            working_dir, code, timeout
         )
-
-        try:
-            stdout, stderr = await asyncio.wait_for(
-                process.communicate(), timeout=timeout
+    except asyncio.TimeoutError:
+        return [
+            TextContent(
+                type="text", text=f"Execution timed out after {timeout} seconds"
             )
-        except asyncio.TimeoutError:
-            process.kill()
-            await process.wait()
-            return [
-                TextContent(
-                    type="text", text=f"Execution timed out after {timeout} seconds"
-                )
-            ]
-
-        output = f"=== Execution Result ===\n"
-        output += f"Exit Code: {process.returncode}\n\n"
-
-        if stdout:
-            output += f"=== STDOUT ===\n{stdout.decode('utf-8', errors='replace')}\n"
+        ]
 
-        if stderr:
-            output += f"=== STDERR ===\n{stderr.decode('utf-8', errors='replace')}\n"
+    parts = [
+        "=== Execution Result ===\n",
+        f"Exit Code: {exit_code}\n\n",
+    ]
 
-        if process.returncode == 0:
-            output += "\n✓ Execution completed successfully"
-        else:
-            output += f"\n✗ Execution failed with exit code {process.returncode}"
+    if stdout:
+        # 解码结果直接放入 parts，避免再经 f-string 复制一遍（输出可能有数 MB）
+        parts.extend(
+            ("=== STDOUT ===\n", stdout.decode("utf-8", errors="replace"), "\n")
+        )
 
-        return [TextContent(type="text", text=output)]
+    if stderr:
+        parts.extend(
+            ("=== STDERR ===\n", stderr.decode("utf-8", errors="replace"), "\n")
+        )
 
-    finally:
-        if script_path.exists():
-            script_path.unlink()
+    if exit_code == 0:
+        parts.append("\n✓ Execution completed successfully")
+    else:
+        parts.append(f"\n✗ Execution failed with exit code {exit_code}")
+
+    return [TextContent(type="text", text="".join(parts))]
+
+
+# 单次安装的总超时
+PIP_INSTALL_TIMEOUT = 300
+# 同一虚拟环境同时只允许一个 pip install 修改 site-packages
+PIP_INSTALL_LOCK = asyncio.Lock()
+# pip list 需要导入 pip 的全部模块，耗时数百毫秒；结果在短时间内复用
+PACKAGE_LIST_TTL = 10.0
+# (过期时间, 结果)，python_install 结束后清空
+_package_list_cache: Optional[tuple[float, list[TextContent]]] = None
+# 已结束的 python_install 次数；pip list 运行期间有安装结束时，其结果不缓存
+_install_count = 0
+# pip 输出只保留最后若干行，以及更早出现的 ERROR/WARNING 行
+PIP_OUTPUT_TAIL_LINES = 200
+
+
+async def _read_pip_output(
+    stream: asyncio.StreamReader,
+) -> tuple[list[str], list[str], int]:
+    """Read pip output line by line with bounded memory.
+
+    Returns (earlier ERROR/WARNING lines, last PIP_OUTPUT_TAIL_LINES lines,
+    number of other lines dropped).
+    """
+    tail = collections.deque(maxlen=PIP_OUTPUT_TAIL_LINES)
+    issues = []
+    dropped = 0
+    async for raw in stream:
+        if len(tail) == tail.maxlen:
+            evicted = tail[0]
+            if (
+                evicted.startswith(("ERROR", "WARNING"))
+                and len(issues) < PIP_OUTPUT_TAIL_LINES
+            ):
+                issues.append(evicted)
+            else:
+                dropped += 1
+        tail.append(raw.decode("utf-8", errors="replace").rstrip())
+    return issues, list(tail), dropped
+
+
+def split_packages(packages: str) -> list[str]:
+    """按 shell 规则拆分包列表，引号内的版本约束（如 "numpy >= 1.26"）保持为一个参数。"""
+    lexer = shlex.shlex(packages, posix=True)
+    lexer.whitespace_split = True
+    # 不把反斜杠当作转义符，以免破坏 Windows 路径（如本地 wheel 文件）
+    lexer.escape = ""
+    # 与 shlex.split(comments=False) 一致：# 是 URL 片段（#egg=、#sha256=），不是注释
+    lexer.commenters = ""
+    return list(lexer)
 
 
 async def install_packages(args: dict) -> list[TextContent]:
     """Install Python packages using pip."""
+    global _package_list_cache, _install_count
     packages = args["packages"].strip()
     upgrade = args.get("upgrade", False)
+    try:
+        package_list = split_packages(packages)
+    except ValueError as e:
+        return [TextContent(type="text", text=f"Error: Invalid package list: {e}")]
 
     cmd = [VENV_PYTHON, "-m", "pip", "install"]
     if upgrade:
         cmd.append("--upgrade")
-    cmd.extend(packages.split())
+    cmd.extend(package_list)
 
-    # CRITICAL FIX: stdin=DEVNULL prevents subprocess from inheriting MCP stdio
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdin=asyncio.subprocess.DEVNULL,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
+    async with PIP_INSTALL_LOCK:
+        # CRITICAL FIX: stdin=DEVNULL prevents subprocess from inheriting MCP stdio
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=1024 * 1024,
+            env=CHILD_ENV,
+        )
 
-    try:
-        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=300)
-    except asyncio.TimeoutError:
-        process.kill()
-        await process.wait()
-        return [
-            TextContent(
-                type="text", text="Package installation timed out after 300 seconds"
+        try:
+            (issues, tail, dropped), _ = await asyncio.wait_for(
+                asyncio.gather(_read_pip_output(process.stdout), process.wait()),
+                timeout=PIP_INSTALL_TIMEOUT,
             )
-        ]
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return [
+                TextContent(
+                    type="text",
+                    text=f"Package installation timed out after {PIP_INSTALL_TIMEOUT} seconds",
+                )
+            ]
+        finally:
+            # 即使安装失败或超时，site-packages 也可能已被部分修改
+            _package_list_cache = None
+            _install_count += 1
+
+    parts = [
+        "=== Package Installation ===\n",
+        f"Command: {' '.join(cmd)}\n\n",
+    ]
 
-    output = f"=== Package Installation ===\n"
-    output += f"Command: {' '.join(cmd)}\n\n"
-    output += stdout.decode("utf-8", errors="replace")
+    if issues:
+        parts.append("=== Earlier Errors/Warnings ===\n" + "\n".join(issues) + "\n\n")
 
-    if stderr:
-        output += f"\n=== STDERR ===\n{stderr.decode('utf-8', errors='replace')}"
+    if dropped:
+        parts.append(f"... [{dropped} earlier lines omitted] ...\n")
+    parts.append("\n".join(tail))
 
     if process.returncode == 0:
-        output += "\n\n✓ Installation completed successfully"
+        parts.append("\n\n✓ Installation completed successfully")
     else:
-        output += f"\n\n✗ Installation failed with exit code {process.returncode}"
+        parts.append(f"\n\n✗ Installation failed with exit code {process.returncode}")
 
-    return [TextContent(type="text", text=output)]
+    return [TextContent(type="text", text="".join(parts))]
 
 
 async def run_script(args: dict) -> list[TextContent]:
@@ -279,111 +638,206 @@ async def run_script(args: dict) -> list[TextContent]:
     working_dir = args.get("working_dir", os.path.dirname(script_path))
     timeout = args.get("timeout", 60)
 
-    if not os.path.isfile(script_path):
-        return [
-            TextContent(type="text", text=f"Error: Script not found: {script_path}")
-        ]
-
     cmd = [VENV_PYTHON, script_path] + script_args
 
-    # CRITICAL FIX: stdin=DEVNULL prevents subprocess from inheriting MCP stdio
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        cwd=working_dir,
-        stdin=asyncio.subprocess.DEVNULL,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-
+    # 不预先检查脚本是否存在：解释器找不到脚本时会以退出码 2 报告，下面照常输出
     try:
-        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
-    except asyncio.TimeoutError:
-        process.kill()
-        await process.wait()
+        # CRITICAL FIX: stdin=DEVNULL prevents subprocess from inheriting MCP stdio
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=working_dir,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=CHILD_ENV,
+        )
+    except (FileNotFoundError, NotADirectoryError):
+        if "working_dir" not in args:
+            # 未指定 working_dir 时默认使用脚本所在目录，目录不存在即脚本不存在
+            return [
+                TextContent(type="text", text=f"Error: Script not found: {script_path}")
+            ]
         return [
             TextContent(
-                type="text", text=f"Script execution timed out after {timeout} seconds"
+                type="text", text=f"Error: Working directory not found: {working_dir}"
             )
         ]
 
-    output = f"=== Script Execution ===\n"
-    output += f"Script: {script_path}\n"
-    output += f"Args: {script_args}\n"
-    output += f"Exit Code: {process.returncode}\n\n"
+    stdout_buf, stderr_buf = OutputBuffer(), OutputBuffer()
+    timed_out = False
+    try:
+        await asyncio.wait_for(
+            _communicate(process, stdout_buf, stderr_buf), timeout=timeout
+        )
+    except asyncio.TimeoutError:
+        # 已读到的输出仍保留在缓冲区中，随超时信息一起返回
+        process.kill()
+        await process.wait()
+        timed_out = True
+    stdout, stderr = stdout_buf.getvalue(), stderr_buf.getvalue()
+
+    parts = [
+        "=== Script Execution ===\n",
+        f"Script: {script_path}\n",
+        f"Args: {script_args}\n",
+        f"Exit Code: {process.returncode}\n\n",
+    ]
 
     if stdout:
-        output += f"=== STDOUT ===\n{stdout.decode('utf-8', errors='replace')}\n"
+        # 解码结果直接放入 parts，避免再经 f-string 复制一遍（输出可能有数 MB）
+        parts.extend(
+            ("=== STDOUT ===\n", stdout.decode("utf-8", errors="replace"), "\n")
+        )
 
     if stderr:
-        output += f"=== STDERR ===\n{stderr.decode('utf-8', errors='replace')}\n"
+        parts.extend(
+            ("=== STDERR ===\n", stderr.decode("utf-8", errors="replace"), "\n")
+        )
 
-    if process.returncode == 0:
-        output += "\n✓ Script completed successfully"
+    if timed_out:
+        parts.append(f"\n✗ Script execution timed out after {timeout} seconds")
+    elif process.returncode == 0:
+        parts.append("\n✓ Script completed successfully")
     else:
-        output += f"\n✗ Script failed with exit code {process.returncode}"
+        parts.append(f"\n✗ Script failed with exit code {process.returncode}")
+
+    return [TextContent(type="text", text="".join(parts))]
+
+
+# python_eval 快速路径：只含字面量和数值运算的表达式直接在 server 进程内求值
+FAST_EVAL_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod)
+FAST_EVAL_UNARYOPS = (ast.UAdd, ast.USub, ast.Not)
+# 乘方的底数和指数都必须是字面量，且指数不超过该值，避免 9**9**9 之类的表达式阻塞事件循环
+FAST_EVAL_MAX_EXPONENT = 1000
+# 只对不超过该长度的表达式走快速路径：限制了节点数和整数大小，
+# 否则 "99999**1000*99999**1000*..." 这类乘方之积仍会长时间阻塞事件循环
+FAST_EVAL_MAX_LENGTH = 200
+
+
+def _is_numeric(node: ast.AST) -> bool:
+    """数值字面量，或只由数值字面量组成的算术/比较/布尔表达式。"""
+    if isinstance(node, ast.Constant):
+        return type(node.value) in (int, float, complex, bool)
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, FAST_EVAL_UNARYOPS) and _is_numeric(node.operand)
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.Pow):
+            return (
+                _is_numeric(node.left)
+                and isinstance(node.left, ast.Constant)
+                and isinstance(node.right, ast.Constant)
+                and type(node.right.value) is int
+                and abs(node.right.value) <= FAST_EVAL_MAX_EXPONENT
+            )
+        return (
+            isinstance(node.op, FAST_EVAL_BINOPS)
+            and _is_numeric(node.left)
+            and _is_numeric(node.right)
+        )
+    if isinstance(node, ast.Compare):
+        return _is_numeric(node.left) and all(map(_is_numeric, node.comparators))
+    if isinstance(node, ast.BoolOp):
+        return all(map(_is_numeric, node.values))
+    return False
+
+
+def _is_fast_eval(node: ast.AST) -> bool:
+    """字面量、数值运算，以及由它们组成的容器。"""
+    if isinstance(node, ast.Constant):
+        return True
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        return all(map(_is_fast_eval, node.elts))
+    if isinstance(node, ast.Dict):
+        return None not in node.keys and all(
+            map(_is_fast_eval, node.keys + node.values)
+        )
+    return _is_numeric(node)
 
-    return [TextContent(type="text", text=output)]
+
+def fast_eval(expression: str) -> Optional[tuple[str, str]]:
+    """在 server 进程内求值简单表达式，返回 (结果, 类型名)；不适用或出错时返回 None，交给子进程处理。"""
+    # 子进程以 `result = <表达式>` 执行，开头有空白时会报缩进错误，保持一致
+    if expression[:1].isspace() or len(expression) > FAST_EVAL_MAX_LENGTH:
+        return None
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+    if not _is_fast_eval(tree.body):
+        return None
+    try:
+        result = eval(compile(tree, "<eval>", "eval"), {"__builtins__": {}})
+        return str(result).lstrip(), type(result).__name__
+    except Exception:
+        return None
 
 
 async def eval_expression(args: dict) -> list[TextContent]:
     """Evaluate a Python expression."""
     expression = args["expression"]
 
-    code = f"result = {expression}\nprint(result)\nprint(f'__TYPE__{{type(result).__name__}}')"
-
-    script_path = Path(TEMP_DIR) / f"mcp_eval_{os.getpid()}.py"
-    script_path.write_text(code, encoding="utf-8")
+    fast = fast_eval(expression)
+    if fast is not None:
+        value, type_info = fast
+        parts = [
+            "=== Expression Evaluation ===\n",
+            f"Expression: {expression}\n",
+            f"Result: {value}\n",
+            f"Type: {type_info}",
+        ]
+        return [TextContent(type="text", text="".join(parts))]
 
     try:
-        # CRITICAL FIX: stdin=DEVNULL prevents subprocess from inheriting MCP stdio
-        process = await asyncio.create_subprocess_exec(
-            VENV_PYTHON,
-            str(script_path),
-            stdin=asyncio.subprocess.DEVNULL,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-
+        # 与 python_execute 共用常驻 worker；worker 直接返回 str(结果) 和类型名，
+        # 无需从打印输出中解析
         try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=10)
+            exit_code, stdout, stderr, value, type_name = await WORKER_POOL.run(
+                "", expression, 10, mode=MODE_EVAL
+            )
         except asyncio.TimeoutError:
-            process.kill()
-            await process.wait()
             return [
                 TextContent(
                     type="text", text=f"Expression evaluation timed out: {expression}"
                 )
             ]
 
-        if process.returncode == 0:
-            stdout_text = stdout.decode("utf-8", errors="replace").strip()
-            lines = stdout_text.split("\n")
-            value = "\n".join(lines[:-1]) if len(lines) > 1 else lines[0]
-            type_info = lines[-1].replace("__TYPE__", "") if lines else "unknown"
-
-            output = f"=== Expression Evaluation ===\n"
-            output += f"Expression: {expression}\n"
-            output += f"Result: {value}\n"
-            output += f"Type: {type_info}"
+        if exit_code == 0:
+            parts = [
+                "=== Expression Evaluation ===\n",
+                f"Expression: {expression}\n",
+                f"Result: {value.decode('utf-8', errors='replace')}\n",
+                f"Type: {type_name.decode('utf-8', errors='replace')}",
+            ]
+            if stdout:
+                # 表达式求值过程中打印的内容
+                parts.extend(
+                    ("\n\n=== STDOUT ===\n", stdout.decode("utf-8", errors="replace"))
+                )
         else:
-            output = f"Error evaluating expression:\n{expression}\n\n"
-            output += f"Error: {stderr.decode('utf-8', errors='replace')}\n"
+            parts = [
+                f"Error evaluating expression:\n{expression}\n\n",
+                f"Error: {stderr.decode('utf-8', errors='replace')}\n",
+            ]
 
-        return [TextContent(type="text", text=output)]
+        return [TextContent(type="text", text="".join(parts))]
 
     except Exception as e:
-        error_msg = f"Error evaluating expression:\n{expression}\n\n"
-        error_msg += f"Error: {str(e)}\n"
-        error_msg += traceback.format_exc()
-        return [TextContent(type="text", text=error_msg)]
-
-    finally:
-        if script_path.exists():
-            script_path.unlink()
+        parts = [
+            f"Error evaluating expression:\n{expression}\n\n",
+            f"Error: {str(e)}\n",
+            traceback.format_exc(),
+        ]
+        return [TextContent(type="text", text="".join(parts))]
 
 
-async def list_packages() -> list[TextContent]:
+async def list_packages(args: dict) -> list[TextContent]:
     """List installed Python packages."""
+    global _package_list_cache
+    now = asyncio.get_running_loop().time()
+    if _package_list_cache is not None and _package_list_cache[0] > now:
+        return _package_list_cache[1]
+    install_count = _install_count
+
     # CRITICAL FIX: stdin=DEVNULL prevents subprocess from inheriting MCP stdio
     process = await asyncio.create_subprocess_exec(
         VENV_PYTHON,
@@ -394,24 +848,48 @@ async def list_packages() -> list[TextContent]:
         stdin=asyncio.subprocess.DEVNULL,
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE,
+        env=CHILD_ENV,
     )
 
     stdout, stderr = await process.communicate()
 
     if process.returncode == 0:
-        packages = json.loads(stdout.decode("utf-8", errors="replace"))
-        output = "=== Installed Python Packages ===\n\n"
-        output += f"{'Package':<30} Version\n"
-        output += "=" * 50 + "\n"
-
-        for pkg in sorted(packages, key=lambda x: x["name"].lower()):
-            output += f"{pkg['name']:<30} {pkg['version']}\n"
-
-        output += f"\nTotal: {len(packages)} packages"
+        packages = _json.loads(stdout)
+        # 一次性生成 (小写名, 名称, 版本) 元组并排序，避免逐项调用 lambda
+        rows = sorted(
+            (pkg["name"].lower(), pkg["name"], pkg["version"]) for pkg in packages
+        )
+        output = "".join(
+            [
+                "=== Installed Python Packages ===\n\n",
+                f"{'Package':<30} Version\n",
+                "=" * 50 + "\n",
+                *[f"{name:<30} {version}\n" for _, name, version in rows],
+                f"\nTotal: {len(packages)} packages",
+            ]
+        )
     else:
         output = f"Error listing packages:\n{stderr.decode('utf-8', errors='replace')}"
+        return [TextContent(type="text", text=output)]
 
-    return [TextContent(type="text", text=output)]
+    result = [TextContent(type="text", text=output)]
+    # 安装进行中，或 pip list 运行期间有安装结束时，结果可能已经过时，不缓存
+    if not PIP_INSTALL_LOCK.locked() and install_count == _install_count:
+        _package_list_cache = (now + PACKAGE_LIST_TTL, result)
+    return result
+
+
+# 工具名 -> 实现函数
+TOOL_HANDLERS = {
+    "python_execute": execute_python,
+    "python_install": install_packages,
+    "python_run_script": run_script,
+    "python_eval": eval_expression,
+    "python_list_packages": list_packages,
+}
+
+# 工具名 -> 必填参数，取自 TOOLS 中声明的 inputSchema
+REQUIRED_ARGS = {tool.name: tool.inputSchema.get("required", []) for tool in TOOLS}
 
 
 # ============================================================
@@ -421,8 +899,15 @@ async def list_packages() -> list[TextContent]:
 
 async def main():
     """Run the MCP server."""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(read_stream, write_stream, app.create_initialization_options())
+    WORKER_POOL.start()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream, write_stream, app.create_initialization_options()
+            )
+    finally:
+        await WORKER_POOL.shutdown()
+        shutil.rmtree(WORKER_SOURCE_DIR, ignore_errors=True)
 
 
 if __name__ == "__main__":